@@ -2,15 +2,21 @@
 
 import argparse
 import logging
+import queue
 import signal
 import sys
 import threading
-import time
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from datetime import timedelta
 from typing import Optional, Sequence
 
+from CoreFoundation import (  # type: ignore
+    CFRunLoopRunInMode,
+    kCFRunLoopDefaultMode,
+    kCFRunLoopRunFinished,
+)
+
 from screentimer.config import load_agent_config
 from screentimer.policy import PolicyConfig, PolicyManager
 from screentimer.processor import FrameProcessor, ProcessorOptions
@@ -18,6 +24,9 @@ from screentimer.screenshot import ScreenshotCaptureManager
 from screentimer.permissions import ensure_screen_recording_permission
 from screentimer.vlm import VLMClient
 
+# Seconds per main run loop slice; bounds how long a signal waits to be handled.
+_MAIN_LOOP_SLICE = 1.0
+
 
 def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run the screen capture agent")
@@ -66,7 +75,7 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     console_handler.addFilter(_SkipLiteLLMFilter())
 
     file_handler = RotatingFileHandler(
-        log_path, maxBytes=5 * 1024 * 1024, backupCount=3
+        log_path, maxBytes=50 * 1024 * 1024, backupCount=3
     )
     file_handler.setLevel(file_level)
 
@@ -77,8 +86,13 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     root_logger = logging.getLogger()
     root_logger.handlers.clear()
     root_logger.setLevel(logging.DEBUG)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    # Handlers run on the listener thread so file I/O never blocks callers.
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(-1)
+    root_logger.addHandler(QueueHandler(log_queue))
+    log_listener = QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    log_listener.start()
 
     for logger_name in list(logging.Logger.manager.loggerDict.keys()):
         if logger_name.lower().startswith("litellm"):
@@ -89,7 +103,14 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     logging.getLogger("openai").setLevel(logging.WARNING)
     logging.getLogger("openai._base_client").setLevel(logging.WARNING)
 
-    vlm_client = VLMClient(model=config.vlm_model, prompt=config.vlm_prompt)
+    vlm_client = VLMClient(
+        model=config.vlm_model,
+        prompt=config.vlm_prompt,
+        image_max_edge=config.vlm_image_max_edge,
+        image_format=config.vlm_image_format,
+        max_connections=max(1, config.vlm_concurrency),
+        response_schema=config.vlm_response_schema,
+    )
     policy_manager = PolicyManager(
         PolicyConfig(
             workday_cutoff=config.workday_cutoff,
@@ -98,6 +119,7 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             violation_capture_interval=config.violation_capture_interval,
             off_hours_start=config.off_hours_start,
             off_hours_grace=timedelta(minutes=config.off_hours_grace_minutes),
+            post_lock_keystroke=config.lock_keystroke,
         )
     )
     processor = FrameProcessor(
@@ -108,6 +130,8 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             queue_size=config.queue_size,
             vlm_client=vlm_client,
             policy_manager=policy_manager,
+            vlm_concurrency=config.vlm_concurrency,
+            vlm_batch_size=config.vlm_batch_size,
         )
     )
 
@@ -117,11 +141,38 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
         else config.capture_interval
     )
 
-    manager = ScreenshotCaptureManager(
-        processor.handle_frame,
-        capture_interval=capture_interval,
-    )
-    policy_manager.set_capture_controller(manager)
+    def _screenshot_manager(*, use_quartz: bool = False) -> ScreenshotCaptureManager:
+        return ScreenshotCaptureManager(
+            processor.handle_frame,
+            capture_interval=capture_interval,
+            max_long_edge=config.capture_max_edge,
+            max_idle_interval=config.capture_max_idle_interval,
+            capture_format=config.capture_format,
+            batch_handler=processor.handle_frames,
+            use_quartz=use_quartz,
+        )
+
+    if config.capture_backend == "stream":
+        try:
+            from screentimer.streaming import StreamCaptureManager
+        except ImportError as exc:
+            logging.warning("ScreenCaptureKit unavailable (%s); falling back to screencapture", exc)
+            manager = _screenshot_manager()
+        else:
+            manager = StreamCaptureManager(
+                processor.handle_frame,
+                capture_interval=capture_interval,
+                max_long_edge=config.capture_max_edge,
+                idle_handler=processor.handle_stream_idle,
+            )
+    elif config.capture_backend == "screencapture":
+        manager = _screenshot_manager()
+    elif config.capture_backend == "quartz":
+        manager = _screenshot_manager(use_quartz=True)
+    else:
+        logging.error("Unknown capture backend %r", config.capture_backend)
+        processor.shutdown()
+        return 1
 
     stop_event = threading.Event()
 
@@ -132,28 +183,51 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     signal.signal(signal.SIGINT, _signal_handler)
     signal.signal(signal.SIGTERM, _signal_handler)
 
-    if not ensure_screen_recording_permission(prompt=True):
-        logging.error("Screen recording permission denied by the user")
-        processor.shutdown()
-        return 1
-
     try:
-        manager.start()
-    except RuntimeError as exc:
-        logging.error("%s", exc)
-        processor.shutdown()
-        return 1
+        if not ensure_screen_recording_permission(prompt=True):
+            logging.error("Screen recording permission denied by the user")
+            processor.shutdown()
+            return 1
+
+        try:
+            manager.start()
+        except RuntimeError as exc:
+            if isinstance(manager, ScreenshotCaptureManager):
+                logging.error("%s", exc)
+                processor.shutdown()
+                return 1
+            logging.warning("%s; falling back to screencapture", exc)
+            manager.stop()
+            manager = _screenshot_manager()
+            try:
+                manager.start()
+            except RuntimeError as fallback_exc:
+                logging.error("%s", fallback_exc)
+                processor.shutdown()
+                return 1
+        policy_manager.set_capture_controller(manager)
+
+        logging.info("Screen capture agent is running")
+
+        try:
+            _run_main_loop(stop_event)
+        finally:
+            manager.stop()
+            processor.shutdown()
+
+        return 0
+    finally:
+        log_listener.stop()
 
-    logging.info("Screen capture agent is running")
 
-    try:
-        while not stop_event.is_set():
-            time.sleep(0.2)
-    finally:
-        manager.stop()
-        processor.shutdown()
+def _run_main_loop(stop_event: threading.Event) -> None:
+    """Spin the main run loop so CoreGraphics display callbacks are delivered."""
 
-    return 0
+    while not stop_event.is_set():
+        result = CFRunLoopRunInMode(kCFRunLoopDefaultMode, _MAIN_LOOP_SLICE, False)
+        if result == kCFRunLoopRunFinished:
+            # No sources attached yet; don't spin.
+            stop_event.wait(_MAIN_LOOP_SLICE)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -4,14 +4,14 @@ import os
 from dataclasses import dataclass
 from datetime import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AgentConfig:
     """Holds runtime options for the capture agent."""
 
@@ -31,77 +31,84 @@ class AgentConfig:
     capture_interval: float = 30.0
     violation_capture_interval: Optional[float] = 5.0
     reminder_interval_seconds: int = 10
+    lock_keystroke: bool = True
     off_hours_start: time = time(17, 0)
     off_hours_grace_minutes: int = 5
+    vlm_concurrency: int = 4
+    vlm_batch_size: int = 1
+    vlm_response_schema: bool = False
+    vlm_image_max_edge: int = 448
+    vlm_image_format: str = "jpeg"
+    capture_max_edge: int = 1280
+    capture_max_idle_interval: Optional[float] = 60.0
+    capture_backend: str = "stream"
+    capture_format: str = "jpg"
+
+
+_ENV_PREFIX = "SCREEN_TIMER_"
+
+
+def _parse_clock(value: str) -> time:
+    hours, minutes = value.split(":") if ":" in value else (value, "0")
+    return time(int(hours), int(minutes))
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _parse_path(value: str) -> Path:
+    return Path(value).expanduser()
+
+
+# Environment variable suffix -> (AgentConfig field, parser).
+_ENV_FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "LOG_INTERVAL": ("log_interval", float),
+    "SAMPLE_INTERVAL": ("sample_interval", float),
+    "CAPTURE_DIR": ("capture_dir", _parse_path),
+    "QUEUE_SIZE": ("queue_size", int),
+    "VLM_MODEL": ("vlm_model", str),
+    "VLM_PROMPT": ("vlm_prompt", str),
+    "LOG_PATH": ("log_path", _parse_path),
+    "WORKDAY_CUTOFF": ("workday_cutoff", _parse_clock),
+    "VIOLATION_GRACE": ("violation_grace_seconds", int),
+    "CAPTURE_INTERVAL": ("capture_interval", float),
+    "VIOLATION_CAPTURE_INTERVAL": ("violation_capture_interval", float),
+    "REMINDER_INTERVAL": ("reminder_interval_seconds", int),
+    "LOCK_KEYSTROKE": ("lock_keystroke", _parse_bool),
+    "OFF_HOURS_START": ("off_hours_start", _parse_clock),
+    "OFF_HOURS_GRACE_MINUTES": ("off_hours_grace_minutes", int),
+    "VLM_CONCURRENCY": ("vlm_concurrency", int),
+    "VLM_BATCH_SIZE": ("vlm_batch_size", int),
+    "VLM_RESPONSE_SCHEMA": ("vlm_response_schema", _parse_bool),
+    "VLM_IMAGE_MAX_EDGE": ("vlm_image_max_edge", int),
+    "VLM_IMAGE_FORMAT": ("vlm_image_format", str),
+    "CAPTURE_MAX_EDGE": ("capture_max_edge", int),
+    "CAPTURE_MAX_IDLE_INTERVAL": ("capture_max_idle_interval", float),
+    "CAPTURE_BACKEND": ("capture_backend", str.lower),
+    "CAPTURE_FORMAT": ("capture_format", str.lower),
+}
 
 
 def load_agent_config() -> AgentConfig:
-    """Load configuration from environment variables (optionally via .env)."""
-
-    capture_dir_env = os.getenv("SCREEN_TIMER_CAPTURE_DIR")
-    capture_dir = Path(capture_dir_env).expanduser() if capture_dir_env else None
-    if capture_dir is not None:
-        capture_dir.mkdir(parents=True, exist_ok=True)
-
-    log_interval = float(os.getenv("SCREEN_TIMER_LOG_INTERVAL", "5"))
-    sample_interval = float(os.getenv("SCREEN_TIMER_SAMPLE_INTERVAL", "10"))
-    queue_size = int(os.getenv("SCREEN_TIMER_QUEUE_SIZE", "16"))
-    capture_interval = float(
-        os.getenv("SCREEN_TIMER_CAPTURE_INTERVAL", str(AgentConfig.capture_interval))
-    )
-    violation_capture_interval_env = os.getenv("SCREEN_TIMER_VIOLATION_CAPTURE_INTERVAL")
-    if violation_capture_interval_env is not None and violation_capture_interval_env.strip():
-        violation_capture_interval = float(violation_capture_interval_env)
-    else:
-        violation_capture_interval = AgentConfig.violation_capture_interval
-    reminder_interval_seconds = int(
-        os.getenv("SCREEN_TIMER_REMINDER_INTERVAL", str(AgentConfig.reminder_interval_seconds))
-    )
-    vlm_model = os.getenv("SCREEN_TIMER_VLM_MODEL")
-    prompt = os.getenv("SCREEN_TIMER_VLM_PROMPT")
-    log_path_env = os.getenv("SCREEN_TIMER_LOG_PATH")
-    if log_path_env:
-        log_path = Path(log_path_env).expanduser()
-    else:
-        log_path = AgentConfig.log_path
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-
-    cutoff_env = os.getenv("SCREEN_TIMER_WORKDAY_CUTOFF")
-    if cutoff_env:
-        hours, minutes = cutoff_env.split(":") if ":" in cutoff_env else (cutoff_env, "0")
-        workday_cutoff = time(int(hours), int(minutes))
-    else:
-        workday_cutoff = AgentConfig.workday_cutoff
-
-    violation_grace = int(os.getenv("SCREEN_TIMER_VIOLATION_GRACE", str(AgentConfig.violation_grace_seconds)))
-
-    off_hours_start_env = os.getenv("SCREEN_TIMER_OFF_HOURS_START")
-    if off_hours_start_env:
-        hours, minutes = off_hours_start_env.split(":") if ":" in off_hours_start_env else (off_hours_start_env, "0")
-        off_hours_start = time(int(hours), int(minutes))
-    else:
-        off_hours_start = AgentConfig.off_hours_start
-
-    off_hours_grace_minutes = int(
-        os.getenv(
-            "SCREEN_TIMER_OFF_HOURS_GRACE_MINUTES",
-            str(AgentConfig.off_hours_grace_minutes),
-        )
-    )
+    """Load configuration from environment variables (optionally via .env).
 
-    return AgentConfig(
-        log_interval=log_interval,
-        sample_interval=sample_interval,
-        capture_dir=capture_dir,
-        queue_size=queue_size,
-        vlm_model=vlm_model or AgentConfig.vlm_model,
-        vlm_prompt=prompt or AgentConfig.vlm_prompt,
-        log_path=log_path,
-        workday_cutoff=workday_cutoff,
-        violation_grace_seconds=violation_grace,
-        capture_interval=capture_interval,
-        violation_capture_interval=violation_capture_interval,
-        reminder_interval_seconds=reminder_interval_seconds,
-        off_hours_start=off_hours_start,
-        off_hours_grace_minutes=off_hours_grace_minutes,
-    )
+    Unset or blank variables keep the `AgentConfig` defaults.
+    """
+
+    overrides: Dict[str, Any] = {}
+    for key, value in os.environ.items():
+        if not key.startswith(_ENV_PREFIX):
+            continue
+        entry = _ENV_FIELDS.get(key[len(_ENV_PREFIX) :])
+        value = value.strip()
+        if entry is None or not value:
+            continue
+        field_name, parse = entry
+        overrides[field_name] = parse(value)
+
+    config = AgentConfig(**overrides)
+    if config.capture_dir is not None:
+        config.capture_dir.mkdir(parents=True, exist_ok=True)
+    config.log_path.parent.mkdir(parents=True, exist_ok=True)
+    return config
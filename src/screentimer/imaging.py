@@ -0,0 +1,104 @@
+"""Pillow helpers for shrinking captured screenshots before they leave the process."""
+
+import io
+import logging
+from typing import Optional
+
+from PIL import Image
+
+_PIL_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+_DHASH_SIZE = (9, 8)  # one extra column so each row yields 8 comparisons
+
+# dHashes closer than this many bits are treated as the same screen content.
+DHASH_SIMILAR_DISTANCE = 6
+
+
+def downscale_image(
+    image_bytes: bytes,
+    *,
+    max_edge: int,
+    image_format: str = "jpeg",
+    quality: int = 70,
+) -> Optional[bytes]:
+    """Fit an encoded screenshot within `max_edge` pixels and re-encode it.
+
+    Images that already fit and are in the requested format are returned as-is.
+    Returns None if the input cannot be decoded or the format is unsupported.
+    """
+
+    pil_format = _PIL_FORMATS.get(image_format.lower())
+    if pil_format is None:
+        logging.warning("Unsupported image format for re-encoding: %s", image_format)
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if max(image.size) <= max_edge and image.format == pil_format:
+                return image_bytes
+            # JPEG sources decode directly at a reduced scale; a no-op otherwise.
+            image.draft("RGB", (max_edge, max_edge))
+            scaled = image.convert("RGB")
+        scaled.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        scaled.save(output, format=pil_format, quality=quality)
+        return output.getvalue()
+    except Exception:  # pragma: no cover
+        logging.exception("Failed to downscale image")
+        return None
+
+
+def encode_bgra(
+    pixels,
+    width: int,
+    height: int,
+    bytes_per_row: int,
+    *,
+    max_edge: int = 0,
+    quality: int = 70,
+) -> Optional[bytes]:
+    """Encode a 32-bit BGRA (or BGRX) pixel buffer as JPEG, fitting it within `max_edge`.
+
+    `pixels` may be any buffer-protocol object; it is read in place.
+    """
+
+    try:
+        image = Image.frombuffer("RGB", (width, height), pixels, "raw", "BGRX", bytes_per_row, 1)
+        if 0 < max_edge < max(width, height):
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+        return output.getvalue()
+    except Exception:  # pragma: no cover
+        logging.exception("Failed to encode BGRA pixels")
+        return None
+
+
+def dhash(image_bytes: bytes) -> Optional[int]:
+    """Return the 64-bit difference hash of an encoded image, or None if undecodable.
+
+    Visually similar screenshots yield hashes with a small Hamming distance.
+    """
+
+    width, height = _DHASH_SIZE
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft("L", _DHASH_SIZE)
+            pixels = image.convert("L").resize(_DHASH_SIZE, Image.Resampling.BOX).tobytes()
+    except Exception:  # pragma: no cover
+        logging.exception("Failed to hash image")
+        return None
+
+    value = 0
+    for row in range(height):
+        offset = row * width
+        for col in range(width - 1):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_similar(first: Optional[int], second: Optional[int]) -> bool:
+    """Return True when both hashes exist and are within `DHASH_SIMILAR_DISTANCE` bits."""
+
+    if first is None or second is None:
+        return False
+    return (first ^ second).bit_count() < DHASH_SIMILAR_DISTANCE
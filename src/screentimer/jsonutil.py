@@ -0,0 +1,25 @@
+"""JSON helpers that use orjson when it is installed."""
+
+import json
+from typing import Any
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional accelerator
+    orjson = None
+
+
+def json_loads(data) -> Any:
+    """Parse a JSON document from `str` or `bytes`."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(value: Any) -> str:
+    """Serialise `value` to a compact JSON string."""
+
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
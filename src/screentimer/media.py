@@ -1,26 +1,52 @@
 """Utilities for working with CMSampleBuffer and converting to image bytes."""
 
 import logging
-from typing import Optional
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
-from AppKit import (  # type: ignore
-    NSBitmapImageFileTypePNG,
-    NSBitmapImageRep,
-)
+from Foundation import NSNull  # type: ignore
 from Quartz import (  # type: ignore
+    CGColorSpaceCreateWithName,
+    CVPixelBufferGetBaseAddress,
+    CVPixelBufferGetBytesPerRow,
     CVPixelBufferGetHeight,
     CVPixelBufferGetWidth,
+    CVPixelBufferLockBaseAddress,
+    CVPixelBufferUnlockBaseAddress,
+    kCGColorSpaceSRGB,
+    kCGImageDestinationLossyCompressionQuality,
+    kCVPixelBufferLock_ReadOnly,
 )
 
-from Quartz import CIContext, CIImage  # type: ignore
+from Quartz import CIContext, CIImage, kCIContextWorkingColorSpace  # type: ignore
 
 import CoreMedia  # type: ignore
 
-_CI_CONTEXT = CIContext.contextWithOptions_(None)
+try:
+    import Metal  # type: ignore
+except ImportError:  # pragma: no cover - declared dependency; default context otherwise
+    Metal = None
+
+_SRGB = CGColorSpaceCreateWithName(kCGColorSpaceSRGB)
+
+JPEG_QUALITY = 0.75
+
+
+def _create_ci_context():
+    # A null working color space skips per-pixel color matching on render.
+    options = {kCIContextWorkingColorSpace: NSNull.null()}
+    device = Metal.MTLCreateSystemDefaultDevice() if Metal is not None else None
+    if device is not None:
+        return CIContext.contextWithMTLDevice_options_(device, options)
+    return CIContext.contextWithOptions_(options)
+
 
+_CI_CONTEXT = _create_ci_context()
 
-def sample_buffer_to_png(sample_buffer) -> Optional[bytes]:
-    """Convert a `CMSampleBufferRef` to PNG bytes."""
+
+def sample_buffer_pixel_buffer(sample_buffer):
+    """Return the `CVPixelBufferRef` behind a sample buffer, or None if unusable."""
 
     if not CoreMedia.CMSampleBufferIsValid(sample_buffer):
         return None
@@ -29,20 +55,64 @@ def sample_buffer_to_png(sample_buffer) -> Optional[bytes]:
     if pixel_buffer is None:
         return None
 
-    width = CVPixelBufferGetWidth(pixel_buffer)
-    height = CVPixelBufferGetHeight(pixel_buffer)
-    if width == 0 or height == 0:
+    if CVPixelBufferGetWidth(pixel_buffer) == 0 or CVPixelBufferGetHeight(pixel_buffer) == 0:
+        return None
+    return pixel_buffer
+
+
+@contextmanager
+def locked_bgra_view(pixel_buffer) -> Iterator[memoryview]:
+    """Yield a zero-copy view over the BGRA bytes of a locked pixel buffer.
+
+    Rows are `CVPixelBufferGetBytesPerRow` bytes apart (which may include
+    padding). The view is only valid inside the `with` block.
+    """
+
+    CVPixelBufferLockBaseAddress(pixel_buffer, kCVPixelBufferLock_ReadOnly)
+    try:
+        size = CVPixelBufferGetBytesPerRow(pixel_buffer) * CVPixelBufferGetHeight(pixel_buffer)
+        view = CVPixelBufferGetBaseAddress(pixel_buffer).as_buffer(size)
+        try:
+            yield view
+        finally:
+            view.release()
+    finally:
+        CVPixelBufferUnlockBaseAddress(pixel_buffer, kCVPixelBufferLock_ReadOnly)
+
+
+def sample_buffer_to_jpeg(sample_buffer, quality: float = JPEG_QUALITY) -> Optional[bytes]:
+    """Convert a `CMSampleBufferRef` to JPEG bytes."""
+
+    pixel_buffer = sample_buffer_pixel_buffer(sample_buffer)
+    if pixel_buffer is None:
         return None
 
     try:
+        # Encode straight from the IOSurface-backed CIImage; no CGImage readback.
         ci_image = CIImage.imageWithCVImageBuffer_(pixel_buffer)
-        extent = ci_image.extent()
-        cg_image = _CI_CONTEXT.createCGImage_fromRect_(ci_image, extent)
-        bitmap = NSBitmapImageRep.alloc().initWithCGImage_(cg_image)
-        data = bitmap.representationUsingType_properties_(
-            NSBitmapImageFileTypePNG, None
+        data = _CI_CONTEXT.JPEGRepresentationOfImage_colorSpace_options_(
+            ci_image,
+            _SRGB,
+            {kCGImageDestinationLossyCompressionQuality: quality},
         )
         return bytes(data) if data is not None else None
     except Exception:  # pragma: no cover
-        logging.exception("Failed to convert sample buffer to PNG")
+        logging.exception("Failed to convert sample buffer to JPEG")
+        return None
+
+
+def sample_buffer_fingerprint(sample_buffer) -> Optional[int]:
+    """Return a CRC32 over every pixel, for cheap duplicate-frame checks.
+
+    Runs directly on the locked pixel buffer, so unchanged frames can be dropped
+    before any color conversion or encoding. The whole buffer is hashed: a
+    strided sample aliases with common widths and misses real changes. zlib
+    hashes in place and releases the GIL while doing so.
+    """
+
+    pixel_buffer = sample_buffer_pixel_buffer(sample_buffer)
+    if pixel_buffer is None:
         return None
+
+    with locked_bgra_view(pixel_buffer) as view:
+        return zlib.crc32(view)
@@ -1,32 +1,61 @@
 """Simple policy manager for enforcing work-hour rules."""
 
-import json
 import logging
+import queue
 import re
 import shutil
 import subprocess
 import sys
+import threading
+import uuid
 from dataclasses import dataclass
 from datetime import datetime, time, timedelta
-from typing import Dict, Optional, Tuple, Protocol
+from functools import lru_cache, partial
+from time import monotonic_ns
+from typing import Callable, Dict, Optional, Tuple, Protocol
 
-_JSON_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+from screentimer.jsonutil import json_loads
+
+try:
+    import UserNotifications  # type: ignore
+except ImportError:  # pragma: no cover - declared dependency; command-line tools otherwise
+    UserNotifications = None
 
+try:
+    import Quartz  # type: ignore
+except ImportError:  # pragma: no cover
+    Quartz = None
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+_JSON_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+_REASON_MARKER = "Reason:"
+_SIDE_EFFECT_QUEUE_SIZE = 8
+# Upper bound for each notifier / lock subprocess, so one hung tool cannot
+# stall the side-effect thread.
+_SIDE_EFFECT_TIMEOUT = 10.0
+_NOTIFICATION_COALESCE_SECONDS = 0.2
+_Q_KEYCODE = 12  # kVK_ANSI_Q
+_DEFAULT_LOCK_CMD: Tuple[str, ...] = (
+    "osascript",
+    "-e",
+    'tell application "System Events" to keystroke "q" using {control down, command down}',
+)
+
+
+@dataclass(frozen=True, slots=True)
 class PolicyConfig:
     workday_cutoff: time
     violation_grace: timedelta
     notification_title: str = "Screen Timer"
-    lock_cmd: Tuple[str, ...] = (
-        "osascript",
-        "-e",
-        'tell application "System Events" to keystroke "q" using {control down, command down}',
-    )
+    lock_cmd: Tuple[str, ...] = _DEFAULT_LOCK_CMD
     reminder_interval: timedelta = timedelta(seconds=10)
     violation_capture_interval: Optional[float] = None
     off_hours_start: time = time(17, 0)
     off_hours_grace: timedelta = timedelta(minutes=5)
+    # Post Control+Command+Q in-process when allowed, in place of the default
+    # lock_cmd (which sends the same keystroke). A custom lock_cmd always runs.
+    post_lock_keystroke: bool = True
 
 
 class CaptureController(Protocol):
@@ -37,11 +66,12 @@ class CaptureController(Protocol):
         ...
 
 
-@dataclass
+@dataclass(slots=True)
 class _ViolationState:
-    first_detected: datetime
-    last_notified: datetime
+    first_detected_ns: int
+    last_notified_ns: int
     notified: bool = False
+    confidence: float = 0.0
 
 
 class PolicyManager:
@@ -49,11 +79,53 @@ class PolicyManager:
 
     def __init__(self, config: PolicyConfig) -> None:
         self._config = config
+        # Frame results and stream idle reports arrive on different threads;
+        # violation and interval bookkeeping is only touched under this lock.
+        self._state_lock = threading.Lock()
         self._violations: Dict[int, _ViolationState] = {}
-        self._last_label: Dict[int, Tuple[str, float]] = {}
-        self._use_terminal_notifier = shutil.which("terminal-notifier") is not None
+        self._notification_center = _user_notification_center()
+        # Absolute paths and close_fds=False let subprocess use posix_spawn.
+        terminal_notifier = shutil.which("terminal-notifier")
+        self._notifier_prefix: Optional[Tuple[str, ...]] = (
+            (
+                terminal_notifier,
+                "-sender",
+                "com.apple.Terminal",
+                "-sound",
+                "Funk",
+                "-title",
+                config.notification_title,
+            )
+            if terminal_notifier is not None
+            else None
+        )
+        self._osascript = shutil.which("osascript") or "osascript"
+        self._osascript_template = (
+            'display notification "{message}" with title "'
+            + config.notification_title.replace("{", "{{").replace("}", "}}")
+            + '" subtitle "{subtitle}" sound name "Funk"'
+        )
+        self._post_lock_keystroke = (
+            config.post_lock_keystroke and config.lock_cmd == _DEFAULT_LOCK_CMD
+        )
         self._capture_controller: Optional[CaptureController] = None
         self._interval_tightened: Dict[int, bool] = {}
+        self._grace_ns = int(config.violation_grace.total_seconds() * 1_000_000_000)
+        self._reminder_ns = int(config.reminder_interval.total_seconds() * 1_000_000_000)
+        start = config.off_hours_start
+        self._off_hours_start_seconds = start.hour * 3600 + start.minute * 60 + start.second
+        self._off_hours_grace_seconds = config.off_hours_grace.total_seconds()
+        # Notifications and lock commands run on a dedicated thread so slow
+        # tools never stall frame-result handling.
+        self._side_effects: queue.Queue[Callable[[], None]] = queue.Queue(
+            maxsize=_SIDE_EFFECT_QUEUE_SIZE
+        )
+        self._side_effect_worker = threading.Thread(
+            target=self._side_effect_loop, name="policy-side-effects", daemon=True
+        )
+        self._side_effect_worker.start()
+        self._notification_lock = threading.Lock()
+        self._pending_notifications: Dict[int, str] = {}
 
     def set_capture_controller(self, controller: CaptureController) -> None:
         self._capture_controller = controller
@@ -61,32 +133,33 @@ class PolicyManager:
     def handle_frame_result(self, display_id: int, result_text: str, *, timestamp: float) -> None:
         parsed = _parse_result(result_text)
         if parsed is None:
-            logging.debug("PolicyManager: unable to parse result for display %s", display_id)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("PolicyManager: unable to parse result for display %s", display_id)
             return
 
-        label = parsed.get("label", "").lower()
-        confidence = float(parsed.get("confidence", 0)) if parsed.get("confidence") is not None else 0.0
-        now = datetime.now()
-
-        self._last_label[display_id] = (label, confidence)
+        label, confidence = parsed
+        with self._state_lock:
+            self._apply_frame_result(display_id, label, confidence)
 
+    def _apply_frame_result(self, display_id: int, label: str, confidence: float) -> None:
         if label != "entertainment" or confidence < 0.6:
             if display_id in self._violations:
-                logging.info("PolicyManager: resetting violation for display %s", display_id)
+                logger.info("PolicyManager: resetting violation for display %s", display_id)
                 self._violations.pop(display_id, None)
                 self._restore_interval(display_id)
-            self._last_label.pop(display_id, None)
             return
 
-        if self._within_off_hours_grace(now):
+        # Work results (the common case) need no clock reads at all.
+        now_ns = monotonic_ns()
+        if self._within_off_hours_grace(datetime.now()):
             if display_id in self._violations:
-                logging.info(
+                logger.info(
                     "PolicyManager: clearing violation for display %s due to off-hours grace",
                     display_id,
                 )
                 self._violations.pop(display_id, None)
                 self._restore_interval(display_id)
-            logging.info(
+            logger.info(
                 "PolicyManager: entertainment on display %s within off-hours grace window; skipping enforcement",
                 display_id,
             )
@@ -94,45 +167,55 @@ class PolicyManager:
 
         state = self._violations.get(display_id)
         if state is None:
-            logging.info(
+            logger.info(
                 "PolicyManager: entertainment detected on display %s (confidence %.2f), issuing warning",
                 display_id,
                 confidence,
             )
             self._send_notification(display_id, "Entertainment detected; please return to work")
-            self._violations[display_id] = _ViolationState(first_detected=now, last_notified=now, notified=True)
+            self._violations[display_id] = _ViolationState(
+                first_detected_ns=now_ns,
+                last_notified_ns=now_ns,
+                notified=True,
+                confidence=confidence,
+            )
             self._tighten_interval(display_id)
             return
 
-        elapsed = now - state.first_detected
-        if elapsed >= self._config.violation_grace:
-            logging.warning(
+        state.confidence = confidence
+        elapsed_ns = now_ns - state.first_detected_ns
+        if elapsed_ns >= self._grace_ns:
+            logger.warning(
                 "PolicyManager: display %s exceeded grace period (%.1fs), locking screen",
                 display_id,
-                elapsed.total_seconds(),
+                elapsed_ns / 1_000_000_000,
             )
             self._lock_screen()
             self._violations.pop(display_id, None)
             self._restore_interval(display_id)
-        elif (now - state.last_notified) >= self._config.reminder_interval:
+        elif now_ns - state.last_notified_ns >= self._reminder_ns:
             # Remind periodically
-            logging.info(
+            logger.info(
                 "PolicyManager: repeated entertainment on display %s; sending reminder",
                 display_id,
             )
             self._send_notification(display_id, "Entertainment still detected; lock imminent")
-            state.last_notified = now
+            state.last_notified_ns = now_ns
 
     # ------------------------------------------------------------------
 
     def handle_stream_idle(self, display_id: int, idle_seconds: float) -> None:
-        now = datetime.now()
+        with self._state_lock:
+            self._apply_stream_idle(display_id, idle_seconds)
+
+    def _apply_stream_idle(self, display_id: int, idle_seconds: float) -> None:
         state = self._violations.get(display_id)
         if state is None:
             return
 
-        if self._within_off_hours_grace(now):
-            logging.info(
+        now_ns = monotonic_ns()
+        if self._within_off_hours_grace(datetime.now()):
+            logger.info(
                 "PolicyManager: ignoring idle entertainment on display %s during off-hours grace",
                 display_id,
             )
@@ -140,69 +223,132 @@ class PolicyManager:
             self._restore_interval(display_id)
             return
 
-        label_info = self._last_label.get(display_id)
-        confidence = label_info[1] if label_info else 0.0
-        logging.info(
+        logger.info(
             "PolicyManager: display %s idle for %.1fs but violation active (confidence %.2f)",
             display_id,
             idle_seconds,
-            confidence,
+            state.confidence,
         )
 
-        elapsed = now - state.first_detected
-        if elapsed >= self._config.violation_grace:
-            logging.warning(
+        elapsed_ns = now_ns - state.first_detected_ns
+        if elapsed_ns >= self._grace_ns:
+            logger.warning(
                 "PolicyManager: idle entertainment on display %s exceeded grace period (%.1fs), locking screen",
                 display_id,
-                elapsed.total_seconds(),
+                elapsed_ns / 1_000_000_000,
             )
             self._lock_screen()
             self._violations.pop(display_id, None)
             self._restore_interval(display_id)
             return
 
-        if (now - state.last_notified) >= self._config.reminder_interval:
+        if now_ns - state.last_notified_ns >= self._reminder_ns:
             self._send_notification(
                 display_id,
-                f"Entertainment still detected (idle {idle_seconds:.0f}s); lock after {int(self._config.violation_grace.total_seconds() - elapsed.total_seconds())}s",
+                f"Entertainment still detected (idle {idle_seconds:.0f}s); lock after {(self._grace_ns - elapsed_ns) // 1_000_000_000}s",
             )
-            state.last_notified = now
+            state.last_notified_ns = now_ns
 
     def _send_notification(self, display_id: int, message: str) -> None:
+        # Reminders for several displays arriving together become one notification.
+        with self._notification_lock:
+            first = not self._pending_notifications
+            self._pending_notifications[display_id] = message
+        if first:
+            timer = threading.Timer(_NOTIFICATION_COALESCE_SECONDS, self._flush_notifications)
+            timer.daemon = True
+            timer.start()
+
+    def _flush_notifications(self) -> None:
+        with self._notification_lock:
+            pending = self._pending_notifications
+            self._pending_notifications = {}
+        if not pending:
+            return
+
+        display_ids = sorted(pending)
+        if len(display_ids) == 1:
+            subtitle = f"Display {display_ids[0]}"
+        else:
+            subtitle = "Displays " + ", ".join(str(display_id) for display_id in display_ids)
+        messages = set(pending.values())
+        if len(messages) == 1:
+            message = messages.pop()
+        else:
+            message = "; ".join(f"Display {display_id}: {pending[display_id]}" for display_id in display_ids)
+        self._submit_side_effect(partial(self._deliver_notification, subtitle, message))
+
+    def _lock_screen(self) -> None:
+        # The violation is already cleared, so a dropped lock would silently
+        # reset enforcement; wait for room instead.
+        self._submit_side_effect(self._run_lock_command, required=True)
+
+    def _submit_side_effect(self, action: Callable[[], None], *, required: bool = False) -> None:
+        if required:
+            self._side_effects.put(action)
+            return
+        try:
+            self._side_effects.put_nowait(action)
+        except queue.Full:
+            logger.warning("PolicyManager: side-effect queue full; dropping %s", action)
+
+    def _side_effect_loop(self) -> None:
+        while True:
+            action = self._side_effects.get()
+            try:
+                action()
+            except Exception:  # pragma: no cover - defensive
+                logger.exception("PolicyManager: side effect failed")
+
+    def _deliver_notification(self, subtitle: str, message: str) -> None:
+        center = self._notification_center
+        if center is not None:
+            content = UserNotifications.UNMutableNotificationContent.alloc().init()
+            content.setTitle_(self._config.notification_title)
+            content.setSubtitle_(subtitle)
+            content.setBody_(message)
+            content.setSound_(UserNotifications.UNNotificationSound.defaultSound())
+            request = UserNotifications.UNNotificationRequest.requestWithIdentifier_content_trigger_(
+                str(uuid.uuid4()), content, None
+            )
+            center.addNotificationRequest_withCompletionHandler_(request, None)
+            return
+
         try:
-            if self._use_terminal_notifier:
-                cmd = [
-                    "terminal-notifier",
-                    "-sender",
-                    "com.apple.Terminal",
-                    "-title",
-                    self._config.notification_title,
-                    "-subtitle",
-                    f"Display {display_id}",
-                    "-message",
-                    message,
-                    "-sound",
-                    "Funk",
-                ]
-                subprocess.run(cmd, check=True)
+            prefix = self._notifier_prefix
+            if prefix is not None:
+                subprocess.run(
+                    (*prefix, "-subtitle", subtitle, "-message", message),
+                    check=True,
+                    close_fds=False,
+                    timeout=_SIDE_EFFECT_TIMEOUT,
+                )
             else:
-                script = (
-                    f'display notification "{message}" with title "{self._config.notification_title}" '
-                    f'subtitle "Display {display_id}" sound name "Funk"'
+                script = self._osascript_template.format(message=message, subtitle=subtitle)
+                subprocess.run(
+                    (self._osascript, "-e", script),
+                    check=True,
+                    close_fds=False,
+                    timeout=_SIDE_EFFECT_TIMEOUT,
                 )
-                subprocess.run(["osascript", "-e", script], check=True)
         except subprocess.CalledProcessError as exc:  # pragma: no cover
-            logging.error("Notification command failed: %s", exc)
+            logger.error("Notification command failed: %s", exc)
+        except subprocess.TimeoutExpired:  # pragma: no cover
+            logger.error("Notification command timed out after %.0fs", _SIDE_EFFECT_TIMEOUT)
         except FileNotFoundError:  # pragma: no cover
-            logging.error("Notification tool not found for alerts")
+            logger.error("Notification tool not found for alerts")
 
-    def _lock_screen(self) -> None:
+    def _run_lock_command(self) -> None:
+        if self._post_lock_keystroke and _post_lock_keystroke():
+            return
         try:
-            subprocess.run(self._config.lock_cmd, check=True)
+            subprocess.run(self._config.lock_cmd, check=True, timeout=_SIDE_EFFECT_TIMEOUT)
         except subprocess.CalledProcessError as exc:  # pragma: no cover
-            logging.error("Lock command failed: %s", exc)
+            logger.error("Lock command failed: %s", exc)
+        except subprocess.TimeoutExpired:  # pragma: no cover
+            logger.error("Lock command timed out after %.0fs", _SIDE_EFFECT_TIMEOUT)
         except FileNotFoundError:  # pragma: no cover
-            logging.error("Lock command not found: %s", self._config.lock_cmd)
+            logger.error("Lock command not found: %s", self._config.lock_cmd)
 
     def _tighten_interval(self, display_id: int) -> None:
         if (
@@ -225,20 +371,96 @@ class PolicyManager:
         self._capture_controller.restore_interval(display_id)
 
     def _within_off_hours_grace(self, now: datetime) -> bool:
-        start = self._config.off_hours_start
-        if now.time() < start:
-            return False
-        start_dt = datetime.combine(now.date(), start)
-        return now - start_dt <= self._config.off_hours_grace
+        elapsed = (
+            now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1_000_000
+        ) - self._off_hours_start_seconds
+        return 0 <= elapsed <= self._off_hours_grace_seconds
 
 
 # ----------------------------------------------------------------------
 
 
-def _parse_result(text: str) -> Optional[dict]:
+def _user_notification_center():
+    """Return the in-process notification center, or None to use command-line tools."""
+
+    if UserNotifications is None:
+        return None
+
+    from Foundation import NSBundle  # type: ignore
+
+    # UNUserNotificationCenter raises for processes without a bundle identifier,
+    # which is the case for a plain `python` interpreter.
+    if NSBundle.mainBundle().bundleIdentifier() is None:
+        return None
+
+    center = UserNotifications.UNUserNotificationCenter.currentNotificationCenter()
+
+    def _authorization_done(granted, error):
+        if not granted:
+            logger.warning("Notification authorization denied: %s", error)
+
+    center.requestAuthorizationWithOptions_completionHandler_(
+        UserNotifications.UNAuthorizationOptionAlert | UserNotifications.UNAuthorizationOptionSound,
+        _authorization_done,
+    )
+    return center
+
+
+def _post_lock_keystroke() -> bool:
+    """Send Control+Command+Q straight to the HID event tap.
+
+    Returns False when Quartz is unavailable or the process may not post events
+    (Accessibility permission), so the caller can fall back to `lock_cmd`.
+    """
+
+    if Quartz is None or not Quartz.CGPreflightPostEventAccess():
+        return False
+
+    flags = Quartz.kCGEventFlagMaskCommand | Quartz.kCGEventFlagMaskControl
+    for key_down in (True, False):
+        event = Quartz.CGEventCreateKeyboardEvent(None, _Q_KEYCODE, key_down)
+        if event is None:
+            return False
+        Quartz.CGEventSetFlags(event, flags)
+        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+    return True
+
+
+@lru_cache(maxsize=256)
+def _parse_result(text: str) -> Optional[Tuple[str, float]]:
+    """Return the lower-cased (label, confidence) pair from a model response.
+
+    Cached on the raw text, since models tend to repeat a few templated answers.
+    """
+
+    parsed = _extract_json(text)
+    if parsed is None:
+        return None
+    label = str(parsed.get("label", "")).lower()
+    confidence = parsed.get("confidence")
+    try:
+        return label, float(confidence) if confidence is not None else 0.0
+    except (TypeError, ValueError):
+        return None
+
+
+def _extract_json(text: str) -> Optional[dict]:
     """Extract JSON object from the model response."""
 
     text = text.strip()
+
+    # Fast path: the model usually answers with a single object, possibly fenced.
+    raw = text.encode()
+    start = raw.find(b"{")
+    end = raw.rfind(b"}")
+    if start != -1 and end > start:
+        try:
+            parsed = json_loads(raw[start : end + 1])
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return parsed
+
     match = _JSON_BLOCK_RE.search(text)
     if match:
         candidate = match.group(1)
@@ -246,21 +468,27 @@ def _parse_result(text: str) -> Optional[dict]:
         candidate = text
 
     # drop trailing explanations such as "Reason: ..."
-    candidate = candidate.split("Reason:", 1)[0].strip()
+    candidate = candidate.partition(_REASON_MARKER)[0].strip()
 
     try:
-        return json.loads(candidate)
-    except json.JSONDecodeError:
-        pass
+        parsed = json_loads(candidate)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict):
+        return parsed
 
     # Try to extract JSON object manually
     brace_index = candidate.find("{")
     if brace_index == -1:
         return None
     json_candidate = candidate[brace_index:]
-    json_candidate = json_candidate.split("Reason:", 1)[0].strip()
+    json_candidate = json_candidate.partition(_REASON_MARKER)[0].strip()
     try:
-        return json.loads(json_candidate)
-    except json.JSONDecodeError:
-        logging.debug("PolicyManager: failed to parse JSON from result: %s", candidate)
-        return None
+        parsed = json_loads(json_candidate)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict):
+        return parsed
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("PolicyManager: failed to parse JSON from result: %s", candidate)
+    return None
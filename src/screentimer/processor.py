@@ -1,16 +1,25 @@
 """Frame processing pipeline: logging, persistence, and VLM dispatch."""
 
 import logging
-import queue
 import threading
 import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
 
+from screentimer.imaging import dhash, dhash_similar
 from screentimer.policy import PolicyManager
 from screentimer.vlm import VLMClient
 
+# How long the worker waits for frames from other displays to join a VLM batch.
+_VLM_BATCH_WINDOW = 0.1
+# Recent (dHash, VLM result) pairs kept for screens revisited on any display.
+_RESULT_CACHE_SIZE = 64
+_FILE_EXTENSIONS = {"jpeg": "jpg"}
+
 
 @dataclass
 class ProcessorOptions:
@@ -20,16 +29,27 @@ class ProcessorOptions:
     queue_size: int
     vlm_client: VLMClient
     policy_manager: Optional[PolicyManager] = None
+    vlm_concurrency: int = 1
+    vlm_batch_size: int = 1
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CapturedImage:
-    """Structure passed from the capture manager into the processor."""
+    """Structure passed from the capture manager into the processor.
+
+    `image_bytes` holds an encoded screenshot; `image_format` is its MIME
+    subtype (e.g. "jpeg"). `timestamp_ns` is the wall-clock capture time and
+    `timestamp` the same instant in float seconds. `fingerprint` is the
+    image's dHash when the capture side already computed it.
+    """
 
     display_id: int
-    png_bytes: bytes
+    image_bytes: bytes
     timestamp: float
+    timestamp_ns: int
     enqueued_monotonic: float
+    image_format: str = "jpeg"
+    fingerprint: Optional[int] = None
 
 
 class FrameProcessor:
@@ -37,14 +57,39 @@ class FrameProcessor:
 
     def __init__(self, options: ProcessorOptions) -> None:
         self._options = options
-        self._stats: Dict[int, int] = {}
+        # Options are fixed for the processor's lifetime; keep hot ones as attributes.
+        self._sample_interval = options.sample_interval
+        self._queue_size = options.queue_size
+        self._capture_dir = options.capture_dir
+        self._vlm_enabled = options.vlm_client.enabled
+        self._policy_manager = options.policy_manager
+        self._vlm_batch_size = options.vlm_batch_size
+        self._batch_limit = max(options.vlm_concurrency, options.vlm_batch_size)
+        # With neither thumbnails nor VLM enabled, sampled frames have nowhere to go.
+        self._has_sink = self._capture_dir is not None or self._vlm_enabled
+        # Counted without a lock (frames arrive from a single capture thread);
+        # the lock only guards swapping the counters out for a log summary.
+        self._stats: Dict[int, int] = defaultdict(int)
         self._stats_lock = threading.Lock()
-        self._last_log = time.monotonic()
+        self._log_interval_ns = int(options.log_interval * 1_000_000_000)
+        self._last_log_ns = time.monotonic_ns()
         self._last_sample: Dict[int, float] = {}
-        self._task_queue: queue.Queue[CapturedImage] = queue.Queue(
-            maxsize=options.queue_size
-        )
+        # display_id -> (dHash, VLM result) of the last frame actually classified.
+        self._last_classified: Dict[int, Tuple[int, str]] = {}
+        self._recent_results: Deque[Tuple[int, str]] = deque(maxlen=_RESULT_CACHE_SIZE)
+        # Bounded by queue_size in handle_frame; the oldest frame is dropped when full.
+        self._task_queue: Deque[CapturedImage] = deque()
+        self._task_cv = threading.Condition()
         self._stop_event = threading.Event()
+        self._vlm_pool: Optional[ThreadPoolExecutor] = None
+        if options.vlm_concurrency > 1 and options.vlm_client.enabled:
+            self._vlm_pool = ThreadPoolExecutor(
+                max_workers=options.vlm_concurrency, thread_name_prefix="vlm"
+            )
+        # Thumbnail writes overlap with VLM requests instead of delaying them.
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        if self._capture_dir is not None:
+            self._io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumb-writer")
         self._worker = threading.Thread(
             target=self._worker_loop, name="frame-processor", daemon=True
         )
@@ -54,46 +99,49 @@ class FrameProcessor:
     def handle_frame(self, frame: CapturedImage) -> None:
         """Entry point passed to the capture manager."""
 
-        self._record_stats(frame)
+        self.handle_frames((frame,))
 
-        if self._options.sample_interval <= 0:
-            return
+    def handle_frames(self, frames: Sequence[CapturedImage]) -> None:
+        """Accept frames captured in the same tick with a single queue hand-off."""
+
+        for frame in frames:
+            self._record_stats(frame)
 
-        last_ts = self._last_sample.get(frame.display_id, 0.0)
-        if frame.timestamp - last_ts < self._options.sample_interval:
+        sample_interval = self._sample_interval
+        if sample_interval <= 0 or not self._has_sink:
             return
 
-        self._last_sample[frame.display_id] = frame.timestamp
-        inserted = False
-        try:
-            self._task_queue.put_nowait(frame)
-            inserted = True
-        except queue.Full:  # pragma: no cover
-            try:
-                dropped = self._task_queue.get_nowait()
-                logging.debug(
-                    "Frame queue full; dropped oldest frame for display %s",
-                    dropped.display_id,
-                )
-            except queue.Empty:  # pragma: no cover
-                dropped = None
+        last_sample = self._last_sample
+        sampled: List[CapturedImage] = []
+        for frame in frames:
+            display_id = frame.display_id
+            timestamp = frame.timestamp
+            if timestamp - last_sample.get(display_id, 0.0) < sample_interval:
+                continue
+            last_sample[display_id] = timestamp
+            sampled.append(frame)
+        if not sampled:
+            return
 
-            try:
-                self._task_queue.put_nowait(frame)
-                inserted = True
-            except queue.Full:  # pragma: no cover
-                logging.warning(
-                    "Frame queue full; dropping newest frame for display %s",
-                    frame.display_id,
-                )
-        if inserted:
-            self._check_queue_pressure()
+        maxsize = self._queue_size
+        task_queue = self._task_queue
+        with self._task_cv:
+            for frame in sampled:
+                if 0 < maxsize <= len(task_queue):
+                    dropped = task_queue.popleft()
+                    logging.debug(
+                        "Frame queue full; dropped oldest frame for display %s",
+                        dropped.display_id,
+                    )
+                task_queue.append(frame)
+            size = len(task_queue)
+            self._task_cv.notify()
+        self._check_queue_pressure(size)
 
-    def _check_queue_pressure(self) -> None:
-        maxsize = self._task_queue.maxsize
+    def _check_queue_pressure(self, size: int) -> None:
+        maxsize = self._queue_size
         if maxsize <= 0:
             return
-        size = self._task_queue.qsize()
         threshold = max(1, int(maxsize * 0.8))
         if size >= threshold:
             if not self._queue_warning_emitted:
@@ -112,84 +160,209 @@ class FrameProcessor:
         """Stop background workers and flush queues."""
 
         self._stop_event.set()
+        with self._task_cv:
+            self._task_cv.notify_all()
         self._worker.join(timeout=5)
-        while not self._task_queue.empty():
-            try:
-                self._task_queue.get_nowait()
-                self._task_queue.task_done()
-            except queue.Empty:  # pragma: no cover
-                break
+        if self._vlm_pool is not None:
+            self._vlm_pool.shutdown(wait=False)
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False)
+        with self._task_cv:
+            self._task_queue.clear()
 
     def handle_stream_idle(self, display_id: int, idle_seconds: float) -> None:
-        policy = self._options.policy_manager
+        policy = self._policy_manager
         if policy is not None:
             policy.handle_stream_idle(display_id, idle_seconds)
 
     # Internal helpers -------------------------------------------------
 
     def _record_stats(self, frame: CapturedImage) -> None:
+        self._stats[frame.display_id] += 1
+        now_ns = time.monotonic_ns()
+        if now_ns - self._last_log_ns < self._log_interval_ns:
+            return
+
         with self._stats_lock:
-            self._stats[frame.display_id] = self._stats.get(frame.display_id, 0) + 1
-            now = time.monotonic()
-            if now - self._last_log >= self._options.log_interval:
-                for display_id, count in self._stats.items():
-                    logging.info(
-                        "Display %s: %s frames captured (ts=%.3f)",
-                        display_id,
-                        count,
-                        frame.timestamp,
-                    )
-                self._stats.clear()
-                self._last_log = now
+            if now_ns - self._last_log_ns < self._log_interval_ns:
+                return
+            stats, self._stats = self._stats, defaultdict(int)
+            self._last_log_ns = now_ns
+        for display_id, count in stats.items():
+            logging.info(
+                "Display %s: %s frames captured (ts=%.3f)",
+                display_id,
+                count,
+                frame.timestamp,
+            )
 
     def _worker_loop(self) -> None:
-        while not self._stop_event.is_set():
-            try:
-                frame = self._task_queue.get(timeout=0.5)
-            except queue.Empty:
-                continue
+        while True:
+            with self._task_cv:
+                self._task_cv.wait_for(self._has_work_or_stop)
+                if self._stop_event.is_set():
+                    return
 
-            try:
-                self._process_sample(frame)
-            finally:
-                self._task_queue.task_done()
+                batch = [self._task_queue.popleft()]
+                deadline = time.monotonic() + _VLM_BATCH_WINDOW
+                while len(batch) < self._batch_limit:
+                    ready = self._task_cv.wait_for(
+                        self._has_work_or_stop,
+                        timeout=max(0.0, deadline - time.monotonic()),
+                    )
+                    if not ready or self._stop_event.is_set():
+                        break
+                    batch.append(self._task_queue.popleft())
 
-    def _process_sample(self, frame: CapturedImage) -> None:
-        processing_started = time.monotonic()
-        queue_delay = processing_started - frame.enqueued_monotonic
-        logging.debug(
-            "FrameProcessor: display %s queue delay %.3fs",
-            frame.display_id,
-            queue_delay,
-        )
+            try:
+                self._process_batch(batch)
+            except Exception:
+                logging.exception(
+                    "FrameProcessor: failed to process a batch of %s frames", len(batch)
+                )
 
-        capture_dir = self._options.capture_dir
-        if capture_dir is not None:
-            self._save_thumbnail(capture_dir, frame)
+    def _has_work_or_stop(self) -> bool:
+        return bool(self._task_queue) or self._stop_event.is_set()
 
-        if self._options.vlm_client.enabled:
-            vlm_started = time.monotonic()
-            result = self._options.vlm_client.classify(frame.png_bytes)
-            vlm_duration = time.monotonic() - vlm_started
+    def _process_batch(self, frames: List[CapturedImage]) -> None:
+        processing_started = time.monotonic()
+        capture_dir = self._capture_dir
+        for frame in frames:
             logging.debug(
-                "FrameProcessor: display %s VLM latency %.3fs",
+                "FrameProcessor: display %s queue delay %.3fs",
                 frame.display_id,
-                vlm_duration,
+                processing_started - frame.enqueued_monotonic,
             )
+            if capture_dir is not None:
+                self._save_thumbnail(capture_dir, frame)
+
+        if not self._vlm_enabled:
+            return
+
+        # Classify concurrently, but feed the policy in capture order on this thread.
+        if self._vlm_batch_size > 1 and len(frames) > 1:
+            results = self._classify_batched(frames)
+        elif self._vlm_pool is not None and len(frames) > 1:
+            results = list(self._vlm_pool.map(self._classify, frames))
+        else:
+            results = [self._classify(frame) for frame in frames]
+
+        policy = self._policy_manager
+        for frame, result in zip(frames, results):
             if result:
                 logging.info("Display %s VLM result: %s", frame.display_id, result)
-                if self._options.policy_manager is not None:
-                    self._options.policy_manager.handle_frame_result(
+                if policy is not None:
+                    policy.handle_frame_result(
                         frame.display_id,
                         result,
                         timestamp=frame.timestamp,
                     )
 
+    def _classify(self, frame: CapturedImage) -> Optional[str]:
+        fingerprint, cached = self._cached_result(frame)
+        if cached is not None:
+            return cached
+
+        display_id = frame.display_id
+        vlm_started = time.monotonic()
+        result = self._options.vlm_client.classify(
+            frame.image_bytes, image_format=frame.image_format
+        )
+        logging.debug(
+            "FrameProcessor: display %s VLM latency %.3fs",
+            display_id,
+            time.monotonic() - vlm_started,
+        )
+        if result and fingerprint is not None:
+            self._remember_result(display_id, fingerprint, result)
+        return result
+
+    def _classify_batched(self, frames: List[CapturedImage]) -> List[Optional[str]]:
+        """Classify frames in multi-image requests of up to `vlm_batch_size`."""
+
+        results: List[Optional[str]] = [None] * len(frames)
+        pending: List[Tuple[int, Optional[int]]] = []
+        for position, frame in enumerate(frames):
+            fingerprint, cached = self._cached_result(frame)
+            if cached is not None:
+                results[position] = cached
+            else:
+                pending.append((position, fingerprint))
+
+        batch_size = self._vlm_batch_size
+        vlm_client = self._options.vlm_client
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start : start + batch_size]
+            if len(chunk) == 1:
+                results[chunk[0][0]] = self._classify(frames[chunk[0][0]])
+                continue
+
+            vlm_started = time.monotonic()
+            batch_results = vlm_client.classify_batch(
+                [
+                    (frames[position].image_bytes, frames[position].image_format)
+                    for position, _fingerprint in chunk
+                ]
+            )
+            logging.debug(
+                "FrameProcessor: VLM batch of %s latency %.3fs",
+                len(chunk),
+                time.monotonic() - vlm_started,
+            )
+            if batch_results is None:
+                # Fall back to one request per frame rather than losing the batch.
+                for position, _fingerprint in chunk:
+                    results[position] = self._classify(frames[position])
+                continue
+            for (position, fingerprint), result in zip(chunk, batch_results):
+                results[position] = result
+                if result and fingerprint is not None:
+                    self._remember_result(frames[position].display_id, fingerprint, result)
+        return results
+
+    def _cached_result(self, frame: CapturedImage) -> Tuple[Optional[int], Optional[str]]:
+        """Return the frame's dHash and the reusable result for it, if any."""
+
+        display_id = frame.display_id
+        fingerprint = frame.fingerprint
+        if fingerprint is None:
+            fingerprint = dhash(frame.image_bytes)
+        previous = self._last_classified.get(display_id)
+        if previous is not None and dhash_similar(fingerprint, previous[0]):
+            logging.debug(
+                "FrameProcessor: display %s unchanged since last classification; reusing result",
+                display_id,
+            )
+            return fingerprint, previous[1]
+        if fingerprint is not None:
+            # Newest first; tuple() snapshots the deque while VLM threads append.
+            for cached_hash, cached_result in reversed(tuple(self._recent_results)):
+                if dhash_similar(fingerprint, cached_hash):
+                    logging.debug(
+                        "FrameProcessor: display %s matches a recently classified screen",
+                        display_id,
+                    )
+                    return fingerprint, cached_result
+        return fingerprint, None
+
+    def _remember_result(self, display_id: int, fingerprint: int, result: str) -> None:
+        entry = (fingerprint, result)
+        self._last_classified[display_id] = entry
+        self._recent_results.append(entry)
+
     def _save_thumbnail(self, capture_dir: Path, frame: CapturedImage) -> None:
-        timestamp_ms = int(frame.timestamp * 1000)
-        filename = f"display-{frame.display_id}-{timestamp_ms}.png"
+        timestamp_ms = frame.timestamp_ns // 1_000_000
+        extension = _FILE_EXTENSIONS.get(frame.image_format, frame.image_format)
+        filename = f"display-{frame.display_id}-{timestamp_ms}.{extension}"
         path = capture_dir / filename
         try:
-            path.write_bytes(frame.png_bytes)
-        except Exception:  # pragma: no cover
-            logging.exception("Failed to write frame thumbnail to %s", path)
+            future = self._io_pool.submit(path.write_bytes, frame.image_bytes)
+        except RuntimeError:  # pragma: no cover - pool already shut down
+            return
+        future.add_done_callback(partial(_log_write_failure, path))
+
+
+def _log_write_failure(path: Path, future: Future) -> None:
+    exc = future.exception()
+    if exc is not None:  # pragma: no cover
+        logging.error("Failed to write frame thumbnail to %s", path, exc_info=exc)
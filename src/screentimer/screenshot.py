@@ -2,17 +2,83 @@
 
 import logging
 import os
+import re
+import shutil
 import subprocess
 import threading
 import time
-from tempfile import NamedTemporaryFile
-from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from tempfile import mkdtemp
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+import Quartz  # type: ignore
 from AppKit import NSScreen  # type: ignore
+from Foundation import NSMutableData  # type: ignore
 
+from screentimer.imaging import dhash, dhash_similar, downscale_image, encode_bgra
 from screentimer.processor import CapturedImage
+from screentimer.topology import DisplayTopologyWatcher
 
 _REFRESH_BACKOFF_SECONDS = 2.0
+# An absolute path (plus close_fds=False and no stdout pipe) lets subprocess use posix_spawn.
+_SCREENCAPTURE = "/usr/sbin/screencapture"
+_CAPTURE_JPEG_QUALITY = 80
+_DECODE_WORKERS = 4
+# `screencapture -t` types accepted for the intermediate file; frames are always emitted as JPEG.
+_CAPTURE_FORMATS = frozenset({"jpg", "bmp", "png", "tiff"})
+_NO_EDGE_LIMIT = 1 << 16
+# CGImage alpha layouts that read as BGRX when stored 32-bit little-endian.
+_BGRX_ALPHA_INFO = frozenset(
+    {Quartz.kCGImageAlphaPremultipliedFirst, Quartz.kCGImageAlphaNoneSkipFirst}
+)
+# CGDisplayCreateImage stalls WindowServer when called rapidly; below this, use screencapture.
+_QUARTZ_MIN_INTERVAL = 2.0
+# Smoothing for per-display capture+handler cost; intervals stretch to twice that cost.
+_COST_EWMA_ALPHA = 0.2
+_COST_INTERVAL_FACTOR = 2.0
+# screencapture / internal errors that mean the display index mapping is stale.
+_REFRESH_TRIGGER_RE = re.compile(
+    r"invalid display|only.*valid value|no displays",
+    re.IGNORECASE,
+)
+
+
+def _is_bgrx(image) -> bool:
+    """Whether the CGImage's bytes are 8-bit BGRA/BGRX that `encode_bgra` can read."""
+
+    if Quartz.CGImageGetBitsPerPixel(image) != 32 or Quartz.CGImageGetBitsPerComponent(image) != 8:
+        return False
+    info = Quartz.CGImageGetBitmapInfo(image)
+    if info & Quartz.kCGBitmapByteOrderMask != Quartz.kCGBitmapByteOrder32Little:
+        return False
+    return info & Quartz.kCGBitmapAlphaInfoMask in _BGRX_ALPHA_INFO
+
+
+@dataclass(slots=True)
+class _DisplayState:
+    """Capture schedule and bookkeeping for one display.
+
+    Every field is updated with a single attribute store, so the capture loop
+    reads states without the lock; writers take it only to check-then-set.
+    """
+
+    display_id: int
+    index: int
+    interval: float
+    idle_interval: float
+    last_capture: float
+    fingerprint: Optional[int] = None
+    cost_ewma: Optional[float] = None
+    load_limited: bool = False
+
+    def effective_interval(self, base_interval: float) -> float:
+        interval = self.interval
+        if interval == base_interval:
+            interval = self.idle_interval
+        if self.cost_ewma is None:
+            return interval
+        return max(interval, _COST_INTERVAL_FACTOR * self.cost_ewma)
 
 
 class ScreenshotCaptureManager:
@@ -23,28 +89,70 @@ class ScreenshotCaptureManager:
         frame_handler: Callable[[CapturedImage], None],
         *,
         capture_interval: float,
+        max_long_edge: int = 0,
+        max_idle_interval: Optional[float] = None,
+        capture_format: str = "jpg",
+        batch_handler: Optional[Callable[[List[CapturedImage]], None]] = None,
+        use_quartz: bool = False,
     ) -> None:
         if capture_interval <= 0:
             raise ValueError("capture_interval must be positive")
+        if capture_format not in _CAPTURE_FORMATS:
+            raise ValueError(f"unsupported capture_format: {capture_format}")
 
         self._frame_handler = frame_handler
+        # Receives every frame of a tick at once; frame_handler is used when unset.
+        self._batch_handler = batch_handler
         self._base_interval = capture_interval
+        self._max_long_edge = max_long_edge
+        # Uncompressed formats skip the encoder in screencapture and the decoder here,
+        # at the cost of a larger temp file.
+        self._capture_format = capture_format
+        # Grab pixels in-process with CGDisplayCreateImage instead of spawning screencapture.
+        if use_quartz and capture_interval < _QUARTZ_MIN_INTERVAL:
+            logging.warning(
+                "ScreenshotCaptureManager: in-process capture needs an interval of at least "
+                "%.1fs; using screencapture",
+                _QUARTZ_MIN_INTERVAL,
+            )
+            use_quartz = False
+        self._use_quartz = use_quartz
+        # Unchanged screens double their interval up to this cap; None disables backoff.
+        self._max_idle_interval = (
+            max(max_idle_interval, capture_interval) if max_idle_interval else None
+        )
         self._stop_event = threading.Event()
+        # Set by stop() and by display reconfiguration; the loop sleeps on it.
+        self._wake_event = threading.Event()
+        self._topology_changed = threading.Event()
+        self._topology = DisplayTopologyWatcher(self._on_topology_changed)
         self._lock = threading.Lock()
-        self._display_intervals: Dict[int, float] = {}
-        self._last_capture: Dict[int, float] = {}
-        self._display_ids: List[int] = []
-        self._display_indices: Dict[int, int] = {}
+        # Both replaced wholesale on refresh; readers load the reference once.
+        self._displays: Tuple[_DisplayState, ...] = ()
+        self._display_by_id: Dict[int, _DisplayState] = {}
         self._worker: Optional[threading.Thread] = None
+        # Reads and downscales the files of a multi-display capture in parallel.
+        self._decode_pool: Optional[ThreadPoolExecutor] = None
+        # Private directory holding one reusable output path per display index.
+        self._tmp_dir: Optional[str] = None
+        self._slot_paths: Dict[int, str] = {}
+        # (inode, mtime_ns) of each slot file when last read; the files are
+        # reused across captures, so an unchanged stamp means a stale frame.
+        self._slot_stamps: Dict[str, Tuple[int, int]] = {}
         self._last_refresh: float = 0.0
 
     # Public API -------------------------------------------------------
 
     def start(self) -> None:
         self._stop_event.clear()
+        self._topology.start()
         if not self._refresh_displays(initial=True):
             raise RuntimeError("No displays available for screenshot capture")
 
+        self._decode_pool = ThreadPoolExecutor(
+            max_workers=_DECODE_WORKERS, thread_name_prefix="capture-decode"
+        )
+
         self._worker = threading.Thread(
             target=self._run_capture_loop,
             name="screenshot-capture",
@@ -54,19 +162,68 @@ class ScreenshotCaptureManager:
 
     def stop(self) -> None:
         self._stop_event.set()
+        self._wake_event.set()
+        self._topology.stop()
         if self._worker is not None:
             self._worker.join(timeout=self._base_interval + 1.0)
             self._worker = None
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=False, cancel_futures=True)
+            self._decode_pool = None
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+            self._slot_paths.clear()
+            self._slot_stamps.clear()
         with self._lock:
-            self._display_ids.clear()
-            self._display_indices.clear()
-            self._display_intervals.clear()
-            self._last_capture.clear()
+            self._displays = ()
+            self._display_by_id = {}
             self._last_refresh = time.monotonic()
         logging.info("ScreenshotCaptureManager stopped")
 
+    def get_effective_interval(self, display_id: int) -> Optional[float]:
+        """Return the interval the display is currently captured at, or None if unknown."""
+
+        state = self._display_by_id.get(display_id)
+        if state is None:
+            return None
+        return state.effective_interval(self._base_interval)
+
     # Internal helpers -------------------------------------------------
 
+    def _on_topology_changed(self) -> None:
+        self._topology_changed.set()
+        self._wake_event.set()
+
+    def _record_cost(self, states: Sequence[_DisplayState], cost: float) -> None:
+        for state in states:
+            previous = state.cost_ewma
+            ewma = cost if previous is None else previous + _COST_EWMA_ALPHA * (cost - previous)
+            state.cost_ewma = ewma
+
+            limited = _COST_INTERVAL_FACTOR * ewma > state.interval
+            if limited == state.load_limited:
+                continue
+            state.load_limited = limited
+            if limited:
+                logging.info(
+                    "ScreenshotCaptureManager: display %s capture+handling takes %.2fs; "
+                    "stretching interval to %.1fs",
+                    state.display_id,
+                    ewma,
+                    _COST_INTERVAL_FACTOR * ewma,
+                )
+            else:
+                logging.info(
+                    "ScreenshotCaptureManager: display %s keeping up again (%.2fs per capture)",
+                    state.display_id,
+                    ewma,
+                )
+
+    def _wait(self, timeout: Optional[float]) -> None:
+        self._wake_event.wait(timeout)
+        self._wake_event.clear()
+
     def _enumerate_displays(self) -> Dict[int, int]:
         screens = NSScreen.screens()
         indices: Dict[int, int] = {}
@@ -81,29 +238,34 @@ class ScreenshotCaptureManager:
         indices = self._enumerate_displays()
         now = time.monotonic()
         with self._lock:
-            old_set = set(self._display_ids)
-            new_ids = sorted(indices.keys())
-            new_set = set(new_ids)
-            added = new_set - old_set
-            removed = old_set - new_set
-
-            self._display_ids = new_ids
-            self._display_indices = indices
-            for display_id in removed:
-                self._display_intervals.pop(display_id, None)
-                self._last_capture.pop(display_id, None)
+            previous = self._display_by_id
+            by_id: Dict[int, _DisplayState] = {}
+            for display_id in sorted(indices):
+                state = previous.get(display_id)
+                if state is None:
+                    state = _DisplayState(
+                        display_id=display_id,
+                        index=indices[display_id],
+                        interval=self._base_interval,
+                        idle_interval=self._base_interval,
+                        last_capture=now - self._base_interval,
+                    )
+                    logging.info(
+                        "ScreenshotCaptureManager: detected display %s (interval %.1fs)",
+                        display_id,
+                        self._base_interval,
+                    )
+                else:
+                    state.index = indices[display_id]
+                by_id[display_id] = state
+            for display_id in previous.keys() - by_id.keys():
                 logging.info(
                     "ScreenshotCaptureManager: removed display %s",
                     display_id,
                 )
-            for display_id in added:
-                self._display_intervals[display_id] = self._base_interval
-                self._last_capture[display_id] = now - self._base_interval
-                logging.info(
-                    "ScreenshotCaptureManager: detected display %s (interval %.1fs)",
-                    display_id,
-                    self._base_interval,
-                )
+
+            self._display_by_id = by_id
+            self._displays = tuple(by_id.values())
             self._last_refresh = now
 
         if not indices:
@@ -115,115 +277,288 @@ class ScreenshotCaptureManager:
 
     def _run_capture_loop(self) -> None:
         while not self._stop_event.is_set():
-            with self._lock:
-                display_ids = list(self._display_ids)
-                intervals = self._display_intervals.copy()
-                last_capture = self._last_capture.copy()
-                last_refresh = self._last_refresh
-
-            if not display_ids:
+            backstop = self._topology.backstop()
+            if self._topology_changed.is_set():
+                self._topology_changed.clear()
+                self._refresh_displays()
+            elif backstop is not None and time.monotonic() - self._last_refresh >= backstop:
+                self._refresh_displays()
+
+            displays = self._displays
+            last_refresh = self._last_refresh
+
+            if not displays:
+                if backstop is None:
+                    # Nothing to capture until a display is attached.
+                    self._wait(None)
+                    continue
                 if time.monotonic() - last_refresh >= _REFRESH_BACKOFF_SECONDS:
                     self._refresh_displays()
-                self._stop_event.wait(1.0)
+                self._wait(1.0)
                 continue
 
             now = time.monotonic()
-            due_displays: List[int] = []
-            next_wait = self._base_interval
-
-            for display_id in display_ids:
-                interval = intervals.get(display_id, self._base_interval)
-                last_time = last_capture.get(display_id, 0.0)
-                elapsed = now - last_time
-                if elapsed >= interval:
-                    due_displays.append(display_id)
-                else:
-                    remaining = interval - elapsed
-                    if remaining < next_wait:
-                        next_wait = remaining
+            base_interval = self._base_interval
+            due_displays: List[_DisplayState]
+            if len(displays) == 1:
+                # The common laptop case: no due-list scan or min-search needed.
+                only = displays[0]
+                remaining = only.effective_interval(base_interval) - (now - only.last_capture)
+                if remaining > 0:
+                    self._wait(max(0.1, min(remaining, base_interval)))
+                    continue
+                due_displays = [only]
+            else:
+                due_displays = []
+                next_wait = base_interval
+                for state in displays:
+                    interval = state.effective_interval(base_interval)
+                    elapsed = now - state.last_capture
+                    if elapsed >= interval:
+                        due_displays.append(state)
+                    else:
+                        remaining = interval - elapsed
+                        if remaining < next_wait:
+                            next_wait = remaining
+
+                if not due_displays:
+                    self._wait(max(0.1, next_wait))
+                    continue
+
+            capture_start = time.monotonic()
+            results = self._capture_images(due_displays)
+            capture_end = time.monotonic()
+
+            frames: List[CapturedImage] = []
+            for state in due_displays:
+                state.last_capture = capture_end
+                image_bytes, error = results[state.display_id]
+                if image_bytes:
+                    frames.append(self._build_frame(state, image_bytes, capture_start))
+                elif error:
+                    self._handle_capture_error(state.display_id, error)
+            if frames:
+                self._dispatch(frames)
+            self._record_cost(due_displays, time.monotonic() - capture_start)
+
+    def _build_frame(
+        self, state: _DisplayState, image_bytes: bytes, capture_start: float
+    ) -> CapturedImage:
+        fingerprint = dhash(image_bytes)
+        self._update_idle_interval(state, fingerprint)
+        timestamp_ns = time.time_ns()
+        return CapturedImage(
+            display_id=state.display_id,
+            image_bytes=image_bytes,
+            timestamp=timestamp_ns / 1e9,
+            timestamp_ns=timestamp_ns,
+            enqueued_monotonic=capture_start,
+            fingerprint=fingerprint,
+        )
 
-            if not due_displays:
-                self._stop_event.wait(max(0.1, next_wait))
-                continue
+    def _dispatch(self, frames: List[CapturedImage]) -> None:
+        try:
+            if self._batch_handler is not None:
+                self._batch_handler(frames)
+            else:
+                for frame in frames:
+                    self._frame_handler(frame)
+        except Exception:  # pragma: no cover - defensive
+            logging.exception("Unhandled exception in frame handler")
+
+    def _update_idle_interval(self, state: _DisplayState, fingerprint: Optional[int]) -> None:
+        max_idle = self._max_idle_interval
+        if max_idle is None:
+            return
+        previous = state.fingerprint
+        if fingerprint is not None:
+            state.fingerprint = fingerprint
+        current = state.idle_interval
+        tightened = state.interval != self._base_interval
+        if dhash_similar(fingerprint, previous) and not tightened:
+            interval = min(current * 2, max_idle)
+        else:
+            interval = self._base_interval
+        if interval == current:
+            return
+        state.idle_interval = interval
+        logging.debug(
+            "ScreenshotCaptureManager: display %s idle interval now %.1fs",
+            state.display_id,
+            interval,
+        )
 
-            for display_id in due_displays:
-                if self._stop_event.is_set():
-                    break
-                capture_start = time.monotonic()
-                png_bytes, error = self._capture_png(display_id)
-                capture_end = time.monotonic()
+    def _capture_images(
+        self, states: Sequence[_DisplayState]
+    ) -> Dict[int, Tuple[Optional[bytes], Optional[str]]]:
+        """Capture the given displays with a single `screencapture` run."""
 
-                if png_bytes:
-                    frame = CapturedImage(
-                        display_id=display_id,
-                        png_bytes=png_bytes,
-                        timestamp=time.time(),
-                        enqueued_monotonic=capture_start,
-                    )
-                    try:
-                        self._frame_handler(frame)
-                    except Exception:  # pragma: no cover - defensive
-                        logging.exception("Unhandled exception in frame handler")
-                elif error:
-                    self._handle_capture_error(display_id, error)
+        if self._use_quartz:
+            return self._capture_quartz(states)
 
-                with self._lock:
-                    if display_id in self._last_capture:
-                        self._last_capture[display_id] = capture_end
+        results: Dict[int, Tuple[Optional[bytes], Optional[str]]] = {}
+        by_index = {state.index: state.display_id for state in states}
 
-    def _capture_png(self, display_id: int) -> Tuple[Optional[bytes], Optional[str]]:
-        with self._lock:
-            index = self._display_indices.get(display_id)
-        if index is None:
-            return None, "missing display index"
+        # One display goes through -D; several are captured in one run, which
+        # writes one file per display in index order.
+        if len(by_index) == 1:
+            index = next(iter(by_index))
+            slots = [index]
+            target_args = ["-D", str(index)]
+        else:
+            slots = list(range(1, max(by_index) + 1))
+            target_args = []
 
-        tmp_path = None
+        tmp_paths = [self._slot_path(index) for index in slots]
         try:
-            tmp = NamedTemporaryFile(suffix=".png", delete=False)
-            tmp_path = tmp.name
-            tmp.close()
-
             result = subprocess.run(
-                [
-                    "screencapture",
-                    "-x",
-                    "-t",
-                    "png",
-                    "-D",
-                    str(index),
-                    tmp_path,
-                ],
+                [_SCREENCAPTURE, "-x", "-t", self._capture_format, *target_args, *tmp_paths],
                 check=False,
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                close_fds=False,
             )
             if result.returncode != 0:
-                error = result.stderr.decode("utf-8", errors="ignore") or result.stdout.decode(
-                    "utf-8", errors="ignore"
+                error = result.stderr.decode("utf-8", errors="ignore")
+                error = error or f"screencapture exited with {result.returncode}"
+                for display_id in by_index.values():
+                    results[display_id] = (None, error)
+                return results
+
+            wanted = [
+                (by_index[index], tmp_path)
+                for index, tmp_path in zip(slots, tmp_paths)
+                if index in by_index
+            ]
+            pool = self._decode_pool
+            if pool is not None and len(wanted) > 1:
+                decoded = pool.map(self._read_capture, [tmp_path for _, tmp_path in wanted])
+            else:
+                decoded = (self._read_capture(tmp_path) for _, tmp_path in wanted)
+            for (display_id, _), outcome in zip(wanted, decoded):
+                results[display_id] = outcome
+            return results
+        except Exception as exc:  # pragma: no cover
+            for display_id in by_index.values():
+                results.setdefault(display_id, (None, str(exc)))
+            return results
+
+    def _capture_quartz(
+        self, states: Sequence[_DisplayState]
+    ) -> Dict[int, Tuple[Optional[bytes], Optional[str]]]:
+        results: Dict[int, Tuple[Optional[bytes], Optional[str]]] = {}
+        images = []
+        for state in states:
+            display_id = state.display_id
+            image = Quartz.CGDisplayCreateImage(display_id)
+            if image is None:
+                results[display_id] = (None, "invalid display")
+            else:
+                images.append((display_id, image))
+
+        pool = self._decode_pool
+        if pool is not None and len(images) > 1:
+            encoded = pool.map(self._encode_cgimage, [image for _, image in images])
+        else:
+            encoded = (self._encode_cgimage(image) for _, image in images)
+        for (display_id, _), outcome in zip(images, encoded):
+            results[display_id] = outcome
+        return results
+
+    def _encode_cgimage(self, image) -> Tuple[Optional[bytes], Optional[str]]:
+        if not _is_bgrx(image):
+            # 10-bit or wide-gamut display formats; let ImageIO convert them.
+            return self._encode_cgimage_imageio(image)
+        pixels = Quartz.CGDataProviderCopyData(Quartz.CGImageGetDataProvider(image))
+        if pixels is None:
+            return None, "empty screenshot"
+        data = encode_bgra(
+            pixels,
+            Quartz.CGImageGetWidth(image),
+            Quartz.CGImageGetHeight(image),
+            Quartz.CGImageGetBytesPerRow(image),
+            max_edge=self._max_long_edge,
+            quality=_CAPTURE_JPEG_QUALITY,
+        )
+        if data is None:
+            return None, "failed to encode screenshot"
+        return data, None
+
+    def _encode_cgimage_imageio(self, image) -> Tuple[Optional[bytes], Optional[str]]:
+        buffer = NSMutableData.data()
+        destination = Quartz.CGImageDestinationCreateWithData(buffer, "public.jpeg", 1, None)
+        if destination is None:
+            return None, "failed to encode screenshot"
+        Quartz.CGImageDestinationAddImage(
+            destination,
+            image,
+            {Quartz.kCGImageDestinationLossyCompressionQuality: _CAPTURE_JPEG_QUALITY / 100},
+        )
+        if not Quartz.CGImageDestinationFinalize(destination):
+            return None, "failed to encode screenshot"
+        data = bytes(buffer)
+        if self._max_long_edge > 0:
+            data = (
+                downscale_image(
+                    data,
+                    max_edge=self._max_long_edge,
+                    image_format="jpeg",
+                    quality=_CAPTURE_JPEG_QUALITY,
                 )
-                return None, error or f"screencapture exited with {result.returncode}"
-
+                or data
+            )
+        return data, None
+
+    def _slot_path(self, index: int) -> str:
+        path = self._slot_paths.get(index)
+        if path is None:
+            if self._tmp_dir is None:
+                self._tmp_dir = mkdtemp(prefix="screentimer-")
+            path = os.path.join(self._tmp_dir, f"display-{index}.{self._capture_format}")
+            self._slot_paths[index] = path
+        return path
+
+    def _read_capture(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        # One right-sized read, without the buffered-IO layer growing its buffer.
+        try:
+            fd = os.open(path, os.O_RDONLY)
             try:
-                with open(tmp_path, "rb") as fh:
-                    data = fh.read()
-            except OSError as exc:  # pragma: no cover
-                return None, str(exc)
-
-            if not data:
-                return None, "empty screenshot"
-            return data, None
-        except Exception as exc:  # pragma: no cover
+                stat = os.fstat(fd)
+                stamp = (stat.st_ino, stat.st_mtime_ns)
+                if self._slot_stamps.get(path) == stamp:
+                    # screencapture did not rewrite this slot; never resend the old frame.
+                    return None, "stale screenshot"
+                self._slot_stamps[path] = stamp
+                data = os.read(fd, stat.st_size) if stat.st_size else b""
+            finally:
+                os.close(fd)
+        except OSError as exc:  # pragma: no cover
             return None, str(exc)
-        finally:
-            if tmp_path is not None:
-                try:
-                    os.remove(tmp_path)
-                except FileNotFoundError:
-                    pass
-                except Exception:
-                    logging.debug(
-                        "ScreenshotCaptureManager: failed to remove temp file %s",
-                        tmp_path,
-                    )
+
+        if not data:
+            return None, "empty screenshot"
+        if self._capture_format != "jpg":
+            # Everything downstream expects JPEG; encode once, shrinking on the way.
+            data = downscale_image(
+                data,
+                max_edge=self._max_long_edge or _NO_EDGE_LIMIT,
+                image_format="jpeg",
+                quality=_CAPTURE_JPEG_QUALITY,
+            )
+            if data is None:
+                return None, f"failed to decode {self._capture_format} screenshot"
+        elif self._max_long_edge > 0:
+            # Retina captures are far larger than any sink needs; shrink once here.
+            data = (
+                downscale_image(
+                    data,
+                    max_edge=self._max_long_edge,
+                    image_format="jpeg",
+                    quality=_CAPTURE_JPEG_QUALITY,
+                )
+                or data
+            )
+        return data, None
 
     def _handle_capture_error(self, display_id: int, error: str) -> None:
         message = (error or "").strip()
@@ -233,15 +568,7 @@ class ScreenshotCaptureManager:
             message or "unknown error",
         )
 
-        lower = message.lower()
-        should_refresh = False
-        if "invalid display" in lower or "only" in lower and "valid value" in lower:
-            should_refresh = True
-        elif "missing display index" in lower:
-            should_refresh = True
-        elif "no displays" in lower:
-            should_refresh = True
-
+        should_refresh = _REFRESH_TRIGGER_RE.search(message) is not None
         if should_refresh and time.monotonic() - self._last_refresh >= 0.5:
             logging.info("ScreenshotCaptureManager: refreshing display topology after failure")
             self._refresh_displays()
@@ -252,12 +579,10 @@ class ScreenshotCaptureManager:
         if interval <= 0:
             return
         with self._lock:
-            if display_id not in self._display_intervals:
-                return
-            current = self._display_intervals.get(display_id, self._base_interval)
-            if current == interval:
+            state = self._display_by_id.get(display_id)
+            if state is None or state.interval == interval:
                 return
-            self._display_intervals[display_id] = interval
+            state.interval = interval
         logging.info(
             "ScreenshotCaptureManager: tightened interval for display %s to %.1fs",
             display_id,
@@ -266,11 +591,10 @@ class ScreenshotCaptureManager:
 
     def restore_interval(self, display_id: int) -> None:
         with self._lock:
-            if display_id not in self._display_intervals:
-                return
-            if self._display_intervals.get(display_id, self._base_interval) == self._base_interval:
+            state = self._display_by_id.get(display_id)
+            if state is None or state.interval == self._base_interval:
                 return
-            self._display_intervals[display_id] = self._base_interval
+            state.interval = self._base_interval
         logging.info(
             "ScreenshotCaptureManager: restored interval for display %s to %.1fs",
             display_id,
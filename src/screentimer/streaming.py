@@ -0,0 +1,499 @@
+"""Continuous capture through ScreenCaptureKit streams (macOS 12.3+)."""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import objc  # type: ignore
+import CoreMedia  # type: ignore
+import ScreenCaptureKit  # type: ignore
+from Foundation import NSObject  # type: ignore
+from Quartz import kCGColorSpaceSRGB, kCVPixelFormatType_32BGRA  # type: ignore
+
+try:
+    import dispatch  # type: ignore
+except ImportError:  # pragma: no cover - declared dependency; default queue otherwise
+    dispatch = None
+
+from screentimer.imaging import dhash
+from screentimer.media import sample_buffer_fingerprint, sample_buffer_to_jpeg
+from screentimer.processor import CapturedImage
+from screentimer.topology import DisplayTopologyWatcher
+
+_SHAREABLE_CONTENT_TIMEOUT = 5.0
+_STOP_TIMEOUT = 2.0
+# How long start() waits for any stream to deliver its first frame.
+_FIRST_FRAME_TIMEOUT = 10.0
+# Delay before restarting a stream the system stopped; doubles while restarts keep failing.
+_RESTART_DELAY = 5.0
+_MAX_RESTART_DELAY = 60.0
+_STREAM_QUEUE_DEPTH = 3
+# Threads encoding frames off the sample queues; at most one frame per display is in flight.
+_ENCODE_WORKERS = 2
+
+# Resolved once; these are looked up for every delivered sample buffer.
+_get_attachments = CoreMedia.CMSampleBufferGetSampleAttachmentsArray
+_FRAME_INFO_STATUS = ScreenCaptureKit.SCStreamFrameInfoStatus
+_FRAME_COMPLETE = ScreenCaptureKit.SCFrameStatusComplete
+_OUTPUT_SCREEN = ScreenCaptureKit.SCStreamOutputTypeScreen
+
+
+def _cm_time(seconds: float):
+    return CoreMedia.CMTimeMake(max(1, int(seconds * 1000)), 1000)
+
+
+def _frame_status(sample_buffer) -> Optional[int]:
+    attachments = _get_attachments(sample_buffer, False)
+    if not attachments:
+        return None
+    return attachments[0].get(_FRAME_INFO_STATUS)
+
+
+def _sample_queue(display_id: int):
+    """Serial USER_INITIATED queue for one display's sample callbacks.
+
+    Returns None (ScreenCaptureKit's default queue) if libdispatch cannot be loaded.
+    """
+
+    if dispatch is None:
+        return None
+    attributes = dispatch.dispatch_queue_attr_make_with_qos_class(
+        dispatch.DISPATCH_QUEUE_SERIAL, dispatch.QOS_CLASS_USER_INITIATED, 0
+    )
+    return dispatch.dispatch_queue_create(
+        f"screentimer.stream.{display_id}".encode(), attributes
+    )
+
+
+def _fetch_displays() -> List[object]:
+    """Return the current `SCDisplay` objects, blocking until ScreenCaptureKit answers."""
+
+    done = threading.Event()
+    result: Dict[str, object] = {}
+
+    def _handler(content, error):
+        result["content"] = content
+        result["error"] = error
+        done.set()
+
+    ScreenCaptureKit.SCShareableContent.getShareableContentWithCompletionHandler_(_handler)
+    if not done.wait(_SHAREABLE_CONTENT_TIMEOUT):
+        logging.warning("StreamCaptureManager: timed out fetching shareable content")
+        return []
+    content = result.get("content")
+    if content is None:
+        logging.warning(
+            "StreamCaptureManager: failed to fetch shareable content: %s",
+            result.get("error"),
+        )
+        return []
+    return list(content.displays() or [])
+
+
+@dataclass(slots=True)
+class _StreamSlot:
+    """One display's stream objects and frame-delivery bookkeeping."""
+
+    display_id: int
+    stream: Any
+    output: Any
+    configuration: Any
+    queue: Any
+    interval: float
+    last_frame: float
+    last_emit: float
+    # Set while a frame is being encoded or handed off; later frames are dropped.
+    in_flight: bool = False
+    # Pixel CRC of the last handed-off frame; only touched while in flight.
+    pixel_crc: Optional[int] = None
+
+
+class _StreamOutput(
+    NSObject,
+    protocols=[objc.protocolNamed("SCStreamOutput"), objc.protocolNamed("SCStreamDelegate")],
+):
+    """Forwards one display's stream callbacks to its manager."""
+
+    def initWithManager_displayID_(self, manager, display_id):
+        self = objc.super(_StreamOutput, self).init()
+        if self is None:
+            return None
+        self._display_id = display_id
+        # Bound once; the sample callback runs for every delivered frame.
+        self._on_sample = manager._handle_sample
+        self._on_stopped = manager._handle_stream_stopped
+        return self
+
+    def stream_didOutputSampleBuffer_ofType_(self, stream, sample_buffer, output_type):
+        if output_type == _OUTPUT_SCREEN:
+            self._on_sample(self._display_id, sample_buffer)
+
+    def stream_didStopWithError_(self, stream, error):
+        self._on_stopped(self._display_id, error)
+
+
+class StreamCaptureManager:
+    """Captures displays through long-lived `SCStream`s instead of polling.
+
+    ScreenCaptureKit only delivers complete frames when a display's content
+    changes, so an unchanged screen costs nothing. Displays without a new frame
+    for longer than their interval are reported to `idle_handler`.
+    """
+
+    def __init__(
+        self,
+        frame_handler: Callable[[CapturedImage], None],
+        *,
+        capture_interval: float,
+        max_long_edge: int = 0,
+        idle_handler: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
+        if capture_interval <= 0:
+            raise ValueError("capture_interval must be positive")
+
+        self._frame_handler = frame_handler
+        self._idle_handler = idle_handler
+        self._base_interval = capture_interval
+        self._max_long_edge = max_long_edge
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._topology_changed = threading.Event()
+        self._topology = DisplayTopologyWatcher(self._on_topology_changed)
+        self._lock = threading.Lock()
+        # Frames are encoded on several threads; hand them on one at a time.
+        self._handler_lock = threading.Lock()
+        # Copy-on-write: replaced under _lock, never mutated, so sample callbacks
+        # and the idle scan read it without locking.
+        self._slots: Dict[int, _StreamSlot] = {}
+        self._worker: Optional[threading.Thread] = None
+        self._encode_pool: Optional[ThreadPoolExecutor] = None
+        self._last_sync = 0.0
+        self._restart_at: Optional[float] = None
+        self._restart_delay = _RESTART_DELAY
+        # Set by the first complete frame; start() waits on it.
+        self._delivering = False
+
+    # Public API -------------------------------------------------------
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._wake_event.clear()
+        self._delivering = False
+        self._encode_pool = ThreadPoolExecutor(
+            max_workers=_ENCODE_WORKERS, thread_name_prefix="stream-encode"
+        )
+        self._topology.start()
+        self._last_sync = time.monotonic()
+        displays = _fetch_displays()
+        for display in displays:
+            self._start_stream(display)
+        if not self._slots:
+            raise RuntimeError("No displays available for stream capture")
+        self._wait_for_first_frame()
+
+        self._worker = threading.Thread(
+            target=self._run_idle_watch,
+            name="stream-idle-watch",
+            daemon=True,
+        )
+        self._worker.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+        self._topology.stop()
+        if self._worker is not None:
+            self._worker.join(timeout=self._base_interval + 1.0)
+            self._worker = None
+        with self._lock:
+            slots, self._slots = self._slots, {}
+        for slot in slots.values():
+            self._stop_stream(slot.stream)
+        if self._encode_pool is not None:
+            self._encode_pool.shutdown(wait=False, cancel_futures=True)
+            self._encode_pool = None
+        logging.info("StreamCaptureManager stopped")
+
+    # Internal helpers -------------------------------------------------
+
+    def _wait_for_first_frame(self) -> None:
+        """Block until a stream delivers a frame; raise if none does in time.
+
+        Streams report start failures asynchronously, so without this a stream
+        that never starts would be retried forever instead of falling back.
+        """
+
+        deadline = time.monotonic() + _FIRST_FRAME_TIMEOUT
+        while not self._delivering:
+            if not self._slots:
+                raise RuntimeError("No display stream started")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(
+                    f"No display stream delivered a frame within {_FIRST_FRAME_TIMEOUT:.0f}s"
+                )
+            self._wake_event.wait(remaining)
+            self._wake_event.clear()
+
+    def _on_topology_changed(self) -> None:
+        self._topology_changed.set()
+        self._wake_event.set()
+
+    def _stream_configuration(self, display, interval: float):
+        width, height = int(display.width()), int(display.height())
+        long_edge = max(width, height)
+        if 0 < self._max_long_edge < long_edge:
+            scale = self._max_long_edge / long_edge
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+
+        configuration = ScreenCaptureKit.SCStreamConfiguration.alloc().init()
+        configuration.setWidth_(width)
+        configuration.setHeight_(height)
+        configuration.setPixelFormat_(kCVPixelFormatType_32BGRA)
+        # Match the JPEG encoder's output space so rendering needs no color conversion.
+        configuration.setColorSpaceName_(kCGColorSpaceSRGB)
+        configuration.setMinimumFrameInterval_(_cm_time(interval))
+        configuration.setQueueDepth_(_STREAM_QUEUE_DEPTH)
+        configuration.setShowsCursor_(False)
+        return configuration
+
+    def _start_stream(self, display) -> bool:
+        display_id = int(display.displayID())
+        configuration = self._stream_configuration(display, self._base_interval)
+        content_filter = ScreenCaptureKit.SCContentFilter.alloc().initWithDisplay_excludingWindows_(
+            display, []
+        )
+        output = _StreamOutput.alloc().initWithManager_displayID_(self, display_id)
+        queue = _sample_queue(display_id)
+        stream = ScreenCaptureKit.SCStream.alloc().initWithFilter_configuration_delegate_(
+            content_filter, configuration, output
+        )
+        ok, error = stream.addStreamOutput_type_sampleHandlerQueue_error_(
+            output, _OUTPUT_SCREEN, queue, None
+        )
+        if not ok:
+            logging.warning(
+                "StreamCaptureManager: cannot attach output for display %s: %s",
+                display_id,
+                error,
+            )
+            return False
+
+        def _started(error):
+            if error is not None:
+                logging.warning(
+                    "StreamCaptureManager: failed to start stream for display %s: %s",
+                    display_id,
+                    error,
+                )
+                self._handle_stream_stopped(display_id, error)
+
+        now = time.monotonic()
+        slot = _StreamSlot(
+            display_id=display_id,
+            stream=stream,
+            output=output,
+            configuration=configuration,
+            queue=queue,
+            interval=self._base_interval,
+            last_frame=now,
+            last_emit=now - self._base_interval,
+        )
+        with self._lock:
+            self._slots = {**self._slots, display_id: slot}
+        stream.startCaptureWithCompletionHandler_(_started)
+        logging.info(
+            "StreamCaptureManager: streaming display %s (interval %.1fs)",
+            display_id,
+            self._base_interval,
+        )
+        return True
+
+    def _stop_stream(self, stream) -> None:
+        done = threading.Event()
+        stream.stopCaptureWithCompletionHandler_(lambda _error: done.set())
+        done.wait(_STOP_TIMEOUT)
+
+    def _handle_sample(self, display_id: int, sample_buffer) -> None:
+        if self._stop_event.is_set():
+            return
+        slot = self._slots.get(display_id)
+        if slot is None:
+            return
+
+        # A display's callbacks arrive serially on its own queue, and only the one
+        # encoder holding its in-flight frame writes its slot otherwise, so the
+        # delivery fields need no lock. The cheap throttle checks come first so
+        # dropped frames never cross the bridge.
+        now = time.monotonic()
+        if now - slot.last_emit < slot.interval * 0.9:
+            return
+        if slot.in_flight:
+            # The previous frame is still being encoded or handed off; drop this
+            # one rather than hold another of ScreenCaptureKit's few surfaces.
+            return
+        if _frame_status(sample_buffer) != _FRAME_COMPLETE:
+            return
+        if not self._delivering:
+            self._delivering = True
+            self._wake_event.set()
+        pool = self._encode_pool
+        if pool is None:
+            return
+        slot.in_flight = True
+        slot.last_emit = now
+        # Encoding and hand-off run off the sample queue, so a slow frame handler
+        # never backs it up (the system stops streams that fall too far behind).
+        try:
+            pool.submit(self._encode_sample, slot, sample_buffer, now)
+        except RuntimeError:  # pool shut down by stop()
+            slot.in_flight = False
+
+    def _encode_sample(self, slot: _StreamSlot, sample_buffer, now: float) -> None:
+        try:
+            # "Complete" frames can still be pixel-identical (e.g. a redraw of the
+            # same content); drop them before paying for the JPEG encode. They
+            # leave last_frame alone so the display still counts as idle.
+            crc = sample_buffer_fingerprint(sample_buffer)
+            if crc is not None:
+                if crc == slot.pixel_crc:
+                    return
+                slot.pixel_crc = crc
+            slot.last_frame = now
+            # A delivered frame means streams are healthy again.
+            self._restart_delay = _RESTART_DELAY
+            image_bytes = sample_buffer_to_jpeg(sample_buffer)
+            if not image_bytes:
+                return
+            timestamp_ns = time.time_ns()
+            frame = CapturedImage(
+                display_id=slot.display_id,
+                image_bytes=image_bytes,
+                timestamp=timestamp_ns / 1e9,
+                timestamp_ns=timestamp_ns,
+                enqueued_monotonic=now,
+                fingerprint=dhash(image_bytes),
+            )
+            with self._handler_lock:
+                self._frame_handler(frame)
+        except Exception:  # pragma: no cover - defensive
+            logging.exception("Unhandled exception in frame handler")
+        finally:
+            slot.in_flight = False
+
+    def _handle_stream_stopped(self, display_id: int, error) -> None:
+        with self._lock:
+            slots = self._slots
+            slot = slots.get(display_id)
+            if slot is not None:
+                self._slots = {key: value for key, value in slots.items() if key != display_id}
+        if slot is not None and not self._stop_event.is_set():
+            delay = self._restart_delay
+            self._restart_delay = min(delay * 2, _MAX_RESTART_DELAY)
+            self._restart_at = time.monotonic() + delay
+            self._wake_event.set()
+            logging.warning(
+                "StreamCaptureManager: stream for display %s stopped: %s; restarting in %.0fs",
+                display_id,
+                error,
+                delay,
+            )
+
+    def _sync_streams(self) -> None:
+        """Start streams for new displays and drop those whose display went away."""
+
+        self._last_sync = time.monotonic()
+        displays = {int(display.displayID()): display for display in _fetch_displays()}
+        if not displays:
+            # Unplugged displays stop their own streams; an empty answer is more
+            # likely a failed query than a reason to tear everything down.
+            return
+        with self._lock:
+            slots = self._slots
+            active = set(slots)
+            removed = [slots[display_id] for display_id in active - displays.keys()]
+            self._slots = {key: value for key, value in slots.items() if key in displays}
+        for slot in removed:
+            logging.info("StreamCaptureManager: removed display %s", slot.display_id)
+            self._stop_stream(slot.stream)
+        for display_id, display in displays.items():
+            if display_id not in active:
+                self._start_stream(display)
+
+    def _run_idle_watch(self) -> None:
+        while not self._stop_event.is_set():
+            backstop = self._topology.backstop()
+            # Without idle reporting there is nothing to poll for: block until a
+            # topology change or stop() wakes us (or the backstop elapses).
+            timeout = self._base_interval if self._idle_handler is not None else backstop
+            restart_at = self._restart_at
+            if restart_at is not None:
+                remaining = max(0.0, restart_at - time.monotonic())
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                return
+
+            restart_at = self._restart_at
+            restart_due = restart_at is not None and time.monotonic() >= restart_at
+            if restart_due:
+                self._restart_at = None
+            if self._topology_changed.is_set() or restart_due:
+                self._topology_changed.clear()
+                self._sync_streams()
+            elif backstop is not None and time.monotonic() - self._last_sync >= backstop:
+                self._sync_streams()
+
+            if self._idle_handler is None:
+                continue
+
+            now = time.monotonic()
+            idle = [
+                (slot.display_id, now - slot.last_frame)
+                for slot in self._slots.values()
+                if now - slot.last_frame >= slot.interval
+            ]
+            for display_id, idle_seconds in idle:
+                try:
+                    self._idle_handler(display_id, idle_seconds)
+                except Exception:  # pragma: no cover - defensive
+                    logging.exception("Unhandled exception in idle handler")
+
+    # Interval control ------------------------------------------------
+
+    def tighten_interval(self, display_id: int, interval: float) -> None:
+        if interval <= 0:
+            return
+        self._set_interval(display_id, interval, "tightened")
+
+    def restore_interval(self, display_id: int) -> None:
+        self._set_interval(display_id, self._base_interval, "restored")
+
+    def _set_interval(self, display_id: int, interval: float, action: str) -> None:
+        with self._lock:
+            slot = self._slots.get(display_id)
+            if slot is None or slot.interval == interval:
+                return
+            slot.interval = interval
+            stream, configuration = slot.stream, slot.configuration
+            configuration.setMinimumFrameInterval_(_cm_time(interval))
+
+        def _updated(error):
+            if error is not None:
+                logging.warning(
+                    "StreamCaptureManager: failed to update stream for display %s: %s",
+                    display_id,
+                    error,
+                )
+
+        stream.updateConfiguration_completionHandler_(configuration, _updated)
+        logging.info(
+            "StreamCaptureManager: %s interval for display %s to %.1fs",
+            action,
+            display_id,
+            interval,
+        )
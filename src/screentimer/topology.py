@@ -0,0 +1,59 @@
+"""Display hot-plug notifications via CoreGraphics reconfiguration callbacks."""
+
+import logging
+from typing import Callable, Optional
+
+import Quartz  # type: ignore
+
+# Polling fallback for when the reconfiguration callback cannot be registered.
+REFRESH_BACKSTOP_SECONDS = 60.0
+
+
+class DisplayTopologyWatcher:
+    """Calls `on_change` after displays are added, removed, or reconfigured.
+
+    CoreGraphics delivers the callback through the main thread's run loop, so
+    the agent must keep that run loop spinning (see `agent.main`).
+    """
+
+    def __init__(self, on_change: Callable[[], None]) -> None:
+        self._on_change = on_change
+        self._registered = False
+        # Keep one bound method so removal passes the same object that was registered.
+        self._handler = self._callback
+
+    def start(self) -> bool:
+        """Register the callback; returns False when the caller must poll instead."""
+
+        if self._registered:
+            return True
+        error = Quartz.CGDisplayRegisterReconfigurationCallback(self._handler, None)
+        if error != Quartz.kCGErrorSuccess:
+            logging.warning(
+                "DisplayTopologyWatcher: registration failed (%s); polling every %.0fs",
+                error,
+                REFRESH_BACKSTOP_SECONDS,
+            )
+            return False
+        self._registered = True
+        return True
+
+    def stop(self) -> None:
+        if not self._registered:
+            return
+        Quartz.CGDisplayRemoveReconfigurationCallback(self._handler, None)
+        self._registered = False
+
+    def backstop(self) -> Optional[float]:
+        """Seconds between forced refreshes, or None while callbacks are live."""
+
+        return None if self._registered else REFRESH_BACKSTOP_SECONDS
+
+    def _callback(self, display_id, flags, _user_info) -> None:
+        # Each change is announced twice; only react once it has completed.
+        if flags & Quartz.kCGDisplayBeginConfigurationFlag:
+            return
+        try:
+            self._on_change()
+        except Exception:  # pragma: no cover - defensive
+            logging.exception("DisplayTopologyWatcher: change handler failed")
@@ -1,48 +1,179 @@
 """Wrapper around litellm for vision-language inference."""
 
-import base64
+import binascii
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import httpx
+import litellm
 from litellm import completion
 
+from screentimer.imaging import downscale_image
+from screentimer.jsonutil import json_dumps, json_loads
+
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+_JSON_OBJECT_FORMAT: Dict[str, Any] = {"type": "json_object"}
+# Structured-output schema holding only the fields the policy reads; a strict
+# schema keeps the model from spending output tokens on prose.
+_RESULT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string", "enum": ["entertainment", "work"]},
+        "confidence": {"type": "number"},
+    },
+    "required": ["label", "confidence"],
+    "additionalProperties": False,
+}
+_BATCH_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"results": {"type": "array", "items": _RESULT_SCHEMA}},
+    "required": ["results"],
+    "additionalProperties": False,
+}
+
+
+def _schema_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+# Leading bytes -> MIME subtype, so uploads are labelled by what they contain.
+_MAGIC_FORMATS = ((b"\xff\xd8\xff", "jpeg"), (b"\x89PNG", "png"), (b"GIF8", "gif"))
+
+
+def _sniff_format(image_bytes: bytes, default: str) -> str:
+    for magic, image_format in _MAGIC_FORMATS:
+        if image_bytes.startswith(magic):
+            return image_format
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp"
+    return default
+
 
 class VLMClient:
     """Calls a vision-language model via litellm."""
 
-    def __init__(self, model: Optional[str], prompt: str) -> None:
+    def __init__(
+        self,
+        model: Optional[str],
+        prompt: str,
+        *,
+        image_max_edge: Optional[int] = None,
+        image_format: str = "jpeg",
+        max_connections: int = 4,
+        response_schema: bool = False,
+    ) -> None:
         self._model = model
         self._prompt = prompt
+        self._image_max_edge = image_max_edge
+        self._image_format = image_format.lower()
+        self._prompt_part: Dict[str, Any] = {"type": "text", "text": prompt}
+        if response_schema:
+            self._response_format = _schema_format("screen_activity", _RESULT_SCHEMA)
+            self._batch_response_format = _schema_format("screen_activities", _BATCH_SCHEMA)
+        else:
+            self._response_format = self._batch_response_format = _JSON_OBJECT_FORMAT
+        if self.enabled and litellm.client_session is None:
+            # One keep-alive pool shared by every request, sized for concurrent
+            # classifications, so calls skip the TCP/TLS handshake.
+            litellm.client_session = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=_HTTP_TIMEOUT,
+            )
 
     @property
     def enabled(self) -> bool:
         return bool(self._model)
 
-    def classify(self, image_bytes: bytes) -> Optional[str]:
+    def classify(self, image_bytes: bytes, *, image_format: str = "jpeg") -> Optional[str]:
         """Run the VLM. Returns the textual response or None on failure."""
 
+        if not self.enabled or not image_bytes:
+            return None
+
+        return self._complete(
+            self._prompt_part,
+            [self._image_part(image_bytes, image_format)],
+            self._response_format,
+        )
+
+    def classify_batch(self, images: Sequence[Tuple[bytes, str]]) -> Optional[List[str]]:
+        """Classify several `(image_bytes, image_format)` pairs with one request.
+
+        Returns one result per image, in order, or None if the request failed or
+        the response could not be split per image.
+        """
+
         if not self.enabled:
             return None
+        if not images:
+            return []
+
+        count = len(images)
+        prompt = (
+            f"{self._prompt}\n\nThe {count} screenshots below are classified independently. "
+            'Respond with a JSON object {"results": [...]} holding one result object per '
+            "screenshot, in the order given."
+        )
+        parts = [self._image_part(data, image_format) for data, image_format in images]
+        content = self._complete(
+            {"type": "text", "text": prompt}, parts, self._batch_response_format
+        )
+        if content is None:
+            return None
+        try:
+            results = json_loads(content)["results"]
+        except (ValueError, KeyError, TypeError):
+            results = None
+        if (
+            not isinstance(results, list)
+            or len(results) != count
+            or not all(isinstance(result, dict) for result in results)
+        ):
+            logging.warning(
+                "VLM batch response does not hold %s result objects: %s", count, content
+            )
+            return None
+        return [json_dumps(result) for result in results]
+
+    def _image_part(self, image_bytes: bytes, image_format: str) -> Dict[str, Any]:
+        if self._image_max_edge:
+            resized = downscale_image(
+                image_bytes,
+                max_edge=self._image_max_edge,
+                image_format=self._image_format,
+            )
+            if resized is not None:
+                image_bytes = resized
+                image_format = self._image_format
 
-        encoded = base64.b64encode(image_bytes).decode("ascii")
-        image_data_url = f"data:image/png;base64,{encoded}"
+        mime = f"image/{_sniff_format(image_bytes, image_format)}"
+        encoded = binascii.b2a_base64(image_bytes, newline=False).decode("ascii")
+        image_data_url = f"data:{mime};base64,{encoded}"
+        return {
+            "type": "image_url",
+            "image_url": {"url": image_data_url, "detail": "low"},
+        }
 
+    def _complete(
+        self,
+        prompt_part: Dict[str, Any],
+        image_parts: List[Dict[str, Any]],
+        response_format: Dict[str, Any],
+    ) -> Optional[str]:
         try:
             response = completion(
                 model=self._model,
                 messages=[
                     {
                         "role": "user",
-                        "content": [
-                            {"type": "text", "text": self._prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_data_url, "detail": "low"},
-                            },
-                        ],
+                        "content": [prompt_part, *image_parts],
                     }
                 ],
-                response_format={"type": "json_object"},
+                response_format=response_format,
             )
         except Exception:  # pragma: no cover
             logging.exception("VLM request failed")